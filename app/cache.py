@@ -0,0 +1,70 @@
+"""
+Cache Module
+
+Small in-process caches shared by the models and services.
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable
+
+# Returned by TTLCache.get when the key is absent or expired
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe, size-bounded LRU cache whose entries expire after `ttl` seconds."""
+
+    def __init__(self, ttl: float = 30.0, max_items: int = 10000):
+        self.ttl = ttl
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'invalidations': 0
+        }
+
+    def get(self, key: Hashable) -> Any:
+        """Return the cached value, or MISSING."""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > time.monotonic():
+                    self._items.move_to_end(key)
+                    self.stats['hits'] += 1
+                    return value
+                del self._items[key]
+            self.stats['misses'] += 1
+            return MISSING
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries past max_items."""
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._items[key] = (time.monotonic() + self.ttl, value)
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        """Drop a key."""
+        with self._lock:
+            if self._items.pop(key, None) is not None:
+                self.stats['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters, hit rate and size."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['size'] = len(self._items)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = stats['hits'] / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,14 @@
+"""
+Config Module
+
+Helpers for reading settings from the environment.
+"""
+import os
+
+
+def env_flag(name: str, default: bool) -> bool:
+    """Read a boolean flag from the environment."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ('1', 'true', 'yes', 'on')
@@ -0,0 +1,212 @@
+"""
+Embedding Cache Module
+
+Content-addressed cache for text embeddings. An in-process LRU sits in front
+of an on-disk SQLite store so that texts we've already embedded (fixed query
+strings, repeated messages) don't cost another Gemini round trip.
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import List, Dict, Optional, Any
+from .config import env_flag
+
+
+class EmbeddingCache:
+    """Two-tier (memory + SQLite) embedding cache keyed by model, task type and text hash."""
+
+    def __init__(self, db_path: str = None, max_memory_items: int = None,
+                 max_disk_items: int = None, enabled: bool = None):
+        """
+        Initialize the cache.
+
+        Args:
+            db_path: Path of the SQLite file backing the disk tier
+            max_memory_items: Maximum number of vectors kept in the in-process LRU
+            max_disk_items: Maximum number of vectors kept on disk
+            enabled: Turn the cache on or off (defaults to EMBEDDING_CACHE_ENABLED)
+        """
+        if enabled is None:
+            enabled = env_flag('EMBEDDING_CACHE_ENABLED', True)
+        if db_path is None:
+            db_path = os.getenv('EMBEDDING_CACHE_PATH',
+                                os.path.join(os.getcwd(), 'embedding_cache.sqlite3'))
+        if max_memory_items is None:
+            max_memory_items = int(os.getenv('EMBEDDING_CACHE_MEMORY_ITEMS', 2048))
+        if max_disk_items is None:
+            max_disk_items = int(os.getenv('EMBEDDING_CACHE_DISK_ITEMS', 100000))
+
+        self.enabled = enabled
+        self.db_path = db_path
+        self.max_memory_items = max_memory_items
+        self.max_disk_items = max_disk_items
+
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._disk_count = 0
+        self.stats = {
+            'memory_hits': 0,
+            'disk_hits': 0,
+            'misses': 0,
+            'evictions': 0
+        }
+
+        if self.enabled:
+            self._open()
+
+    def _open(self) -> None:
+        """Open the SQLite store, disabling the disk tier if that fails."""
+        try:
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS embeddings ('
+                ' key TEXT PRIMARY KEY,'
+                ' vector BLOB NOT NULL,'
+                ' last_used REAL NOT NULL)'
+            )
+            self._conn.execute(
+                'CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)'
+            )
+            self._conn.commit()
+            self._disk_count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        except Exception as e:
+            print(f"Warning: Embedding cache disk store unavailable, using memory only: {e}")
+            self._conn = None
+
+    @staticmethod
+    def make_key(model: str, task_type: str, text: str) -> str:
+        """Build the content-addressed cache key for a text."""
+        digest = hashlib.sha256(text.encode('utf-8')).hexdigest()
+        return f"{model}|{task_type}|{digest}"
+
+    def get_many(self, model: str, task_type: str, texts: List[str]) -> Dict[int, List[float]]:
+        """
+        Look up cached embeddings for the given texts.
+
+        Returns:
+            Dict mapping the index of each cached text to its embedding
+        """
+        found = {}
+        if not self.enabled:
+            return found
+
+        keys = [self.make_key(model, task_type, text) for text in texts]
+        disk_lookups = {}
+
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    found[i] = list(vector)
+                else:
+                    disk_lookups.setdefault(key, []).append(i)
+
+            if disk_lookups and self._conn is not None:
+                try:
+                    placeholders = ','.join('?' * len(disk_lookups))
+                    rows = self._conn.execute(
+                        f'SELECT key, vector FROM embeddings WHERE key IN ({placeholders})',
+                        list(disk_lookups.keys())
+                    ).fetchall()
+                    now = time.time()
+                    for key, blob in rows:
+                        vector = array('f')
+                        vector.frombytes(blob)
+                        self._remember(key, vector)
+                        for i in disk_lookups.pop(key):
+                            self.stats['disk_hits'] += 1
+                            found[i] = list(vector)
+                    if rows:
+                        self._conn.executemany(
+                            'UPDATE embeddings SET last_used = ? WHERE key = ?',
+                            [(now, key) for key, _ in rows]
+                        )
+                        self._conn.commit()
+                except Exception as e:
+                    print(f"Warning: Embedding cache read failed: {e}")
+
+            self.stats['misses'] += sum(len(indexes) for indexes in disk_lookups.values())
+
+        return found
+
+    def put_many(self, model: str, task_type: str, texts: List[str], embeddings: List[List[float]]) -> None:
+        """Store embeddings for the given texts in both tiers."""
+        if not self.enabled or not texts:
+            return
+
+        rows = []
+        now = time.time()
+        with self._lock:
+            for text, embedding in zip(texts, embeddings):
+                key = self.make_key(model, task_type, text)
+                vector = array('f', embedding)
+                self._remember(key, vector)
+                rows.append((key, vector.tobytes(), now))
+
+            if self._conn is None:
+                return
+            try:
+                self._conn.executemany(
+                    'INSERT OR REPLACE INTO embeddings (key, vector, last_used) VALUES (?, ?, ?)',
+                    rows
+                )
+                self._conn.commit()
+                self._disk_count += len(rows)
+                if self._disk_count > self.max_disk_items:
+                    self._evict_disk()
+            except Exception as e:
+                print(f"Warning: Embedding cache write failed: {e}")
+
+    def _remember(self, key: str, vector: array) -> None:
+        """Insert into the in-process LRU, evicting the least recently used entries."""
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_memory_items:
+            self._memory.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _evict_disk(self) -> None:
+        """Trim the disk store back to its size bound, oldest entries first."""
+        self._disk_count = self._conn.execute('SELECT COUNT(*) FROM embeddings').fetchone()[0]
+        overflow = self._disk_count - self.max_disk_items
+        if overflow <= 0:
+            return
+        self._conn.execute(
+            'DELETE FROM embeddings WHERE key IN ('
+            ' SELECT key FROM embeddings ORDER BY last_used ASC LIMIT ?)',
+            (overflow,)
+        )
+        self._conn.commit()
+        self._disk_count -= overflow
+        self.stats['evictions'] += overflow
+
+    def clear(self) -> None:
+        """Drop every cached embedding."""
+        with self._lock:
+            self._memory.clear()
+            if self._conn is not None:
+                self._conn.execute('DELETE FROM embeddings')
+                self._conn.commit()
+            self._disk_count = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current sizes."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats.update({
+                'enabled': self.enabled,
+                'memory_items': len(self._memory),
+                'disk_items': self._disk_count
+            })
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = (stats['memory_hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+        return stats
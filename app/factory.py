@@ -1,8 +1,6 @@
 import os
 from flask import Flask
 from dotenv import load_dotenv
-import chromadb
-from chromadb.config import Settings
 
 # Disable ChromaDB telemetry
 os.environ['ANONYMIZED_TELEMETRY'] = 'False'
@@ -19,18 +17,25 @@ def create_app():
     app.config.update(
         SECRET_KEY=os.getenv('SECRET_KEY', 'dev-secret-key'),
         MONGO_URI=os.getenv('MONGODB_URI', 'mongodb://localhost:27017/ai_friend'),
-        GOOGLE_API_KEY=os.getenv('GOOGLE_API_KEY')
+        GOOGLE_API_KEY=os.getenv('GOOGLE_API_KEY'),
+        CHROMA_DB_PATH=os.getenv('CHROMA_DB_PATH', os.path.join(os.getcwd(), 'chroma_db')),
+        STATUS_PROBE_INTERVAL=int(os.getenv('STATUS_PROBE_INTERVAL', 60))
     )
     
     # Initialize extensions
     from .extensions import mongo
     mongo.init_app(app)
     
-    # Initialize ChromaDB with telemetry disabled
-    chroma_client = chromadb.PersistentClient(
-        path="./chroma_db",
-        settings=Settings(anonymized_telemetry=False)
-    )
+    # Configure Gemini and register the memory system; ChromaDB is opened
+    # lazily on first use through a single shared client
+    from . import gemini
+    from .memory_system import memory_system
+    gemini.configure(app.config['GOOGLE_API_KEY'])
+    memory_system.init_app(app)
+    
+    # Upstream health is probed in the background and cached for /api/status
+    from .health import health_monitor
+    health_monitor.init_app(app)
     
     # Add context processor to make current datetime available in all templates
     @app.context_processor
@@ -0,0 +1,245 @@
+"""
+Gemini Module
+
+Lazy, idempotent setup of the Google Gemini client. Nothing is imported or
+configured until the first caller needs the API, so importing the app and
+creating a worker stay fast and free of side effects.
+
+Generation and embedding calls go through generate_content and
+embed_content, which apply a per-call deadline, a circuit breaker and a
+cluster-wide rate limit per operation. While Gemini is failing or the
+quota is used up, calls are rejected quickly (CircuitOpenError or
+RateLimitedError) so callers can go straight to their fallbacks.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict, Iterator
+from .rate_limit import TokenBucket, RateLimitedError
+
+GENERATION_MODEL = 'gemini-1.5-flash'
+EMBEDDING_MODEL = 'models/embedding-001'
+
+# Per-call deadlines in seconds
+GENERATE_TIMEOUT = float(os.getenv('GEMINI_GENERATE_TIMEOUT', 20))
+EMBED_TIMEOUT = float(os.getenv('GEMINI_EMBED_TIMEOUT', 5))
+
+_lock = threading.Lock()
+_api_key = None
+_genai = None
+_model = None
+
+
+def configure(api_key: str = None) -> None:
+    """
+    Set the API key used when the Gemini client is first needed.
+
+    Args:
+        api_key: API key to use (defaults to the GOOGLE_API_KEY environment variable)
+    """
+    global _api_key
+    _api_key = api_key
+
+
+def get_genai():
+    """Return the google.generativeai module, configuring it on first use."""
+    global _genai
+    if _genai is None:
+        with _lock:
+            if _genai is None:
+                import google.generativeai as genai
+                api_key = _api_key or os.getenv('GOOGLE_API_KEY')
+                if api_key:
+                    genai.configure(api_key=api_key)
+                else:
+                    print("Warning: GOOGLE_API_KEY not set; Gemini calls will use fallbacks")
+                _genai = genai
+    return _genai
+
+
+def get_model():
+    """Return the shared generative model used for chat responses."""
+    global _model
+    if _model is None:
+        _model = get_genai().GenerativeModel(GENERATION_MODEL)
+    return _model
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling Gemini while an operation's circuit is open."""
+
+
+class CircuitBreaker:
+    """
+    Closed/open/half-open circuit breaker for one upstream operation.
+
+    After `failure_threshold` consecutive failures the circuit opens and
+    calls are rejected for `reset_timeout` seconds. It then lets a single
+    trial call through (half-open): success closes the circuit, failure
+    opens it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial_started_at = None
+        self._lock = threading.Lock()
+
+    def before_call(self) -> bool:
+        """
+        Raise CircuitOpenError unless a call may go ahead now.
+
+        Returns:
+            bool: True if this call is the half-open trial
+        """
+        with self._lock:
+            if self.state == self.CLOSED:
+                return False
+            now = time.monotonic()
+            # A trial that never reported back doesn't block the circuit forever
+            trial_pending = (self._trial_started_at is not None and
+                             now - self._trial_started_at < self.reset_timeout)
+            if now - self.opened_at >= self.reset_timeout and not trial_pending:
+                self.state = self.HALF_OPEN
+                self._trial_started_at = now
+                return True
+            self.rejected += 1
+        raise CircuitOpenError(f"Gemini {self.name} circuit is open")
+
+    def release_trial(self) -> None:
+        """Give up a trial that never reached upstream so the next call can take it."""
+        with self._lock:
+            self._trial_started_at = None
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._trial_started_at = None
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+            self._trial_started_at = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'state': self.state,
+                'consecutive_failures': self.failures,
+                'rejected': self.rejected
+            }
+
+
+_breakers = {
+    operation: CircuitBreaker(
+        operation,
+        failure_threshold=int(os.getenv('GEMINI_BREAKER_FAILURES', 5)),
+        reset_timeout=float(os.getenv('GEMINI_BREAKER_RESET', 30))
+    )
+    for operation in ('generate', 'embed')
+}
+
+
+_buckets = {
+    'generate': TokenBucket('gemini_generate', float(os.getenv('GEMINI_GENERATE_RPM', 60))),
+    'embed': TokenBucket('gemini_embed', float(os.getenv('GEMINI_EMBED_RPM', 1500)))
+}
+
+
+def rate_limit_stats() -> Dict[str, Dict[str, Any]]:
+    """Return this process's rate limiter counters for each operation."""
+    return {operation: bucket.get_stats() for operation, bucket in _buckets.items()}
+
+
+def circuit_stats() -> Dict[str, Dict[str, Any]]:
+    """Return the state of each operation's circuit breaker."""
+    return {operation: breaker.get_stats() for operation, breaker in _breakers.items()}
+
+
+def generate_content(contents, stream: bool = False, priority: str = 'interactive',
+                     timeout: float = None, **kwargs):
+    """
+    Call GenerativeModel.generate_content through the 'generate' circuit and rate limit.
+
+    The request times out after `timeout` seconds (default GENERATE_TIMEOUT).
+
+    Raises:
+        CircuitOpenError: If generation is failing and the circuit is open
+        RateLimitedError: If no rate limit token became available in time
+    """
+    breaker = _breakers['generate']
+    trial = breaker.before_call()
+    try:
+        _buckets['generate'].acquire(priority)
+    except RateLimitedError:
+        # A shed call says nothing about upstream health
+        if trial:
+            breaker.release_trial()
+        raise
+    try:
+        response = get_model().generate_content(
+            contents, stream=stream, request_options={'timeout': timeout or GENERATE_TIMEOUT}, **kwargs
+        )
+    except Exception:
+        breaker.record_failure()
+        raise
+    if stream:
+        return _track_stream(breaker, response)
+    breaker.record_success()
+    return response
+
+
+def _track_stream(breaker: CircuitBreaker, stream) -> Iterator:
+    """Pass a response stream through, reporting its outcome to the breaker."""
+    try:
+        for chunk in stream:
+            yield chunk
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+
+
+def embed_content(content, task_type: str, model: str = EMBEDDING_MODEL,
+                  priority: str = 'interactive', timeout: float = None) -> Dict[str, Any]:
+    """
+    Call genai.embed_content through the 'embed' circuit and rate limit.
+
+    The request times out after `timeout` seconds (default EMBED_TIMEOUT).
+
+    Raises:
+        CircuitOpenError: If embedding is failing and the circuit is open
+        RateLimitedError: If no rate limit token became available in time
+    """
+    breaker = _breakers['embed']
+    trial = breaker.before_call()
+    try:
+        _buckets['embed'].acquire(priority)
+    except RateLimitedError:
+        # A shed call says nothing about upstream health
+        if trial:
+            breaker.release_trial()
+        raise
+    try:
+        result = get_genai().embed_content(
+            model=model, content=content, task_type=task_type,
+            request_options={'timeout': timeout or EMBED_TIMEOUT}
+        )
+    except Exception:
+        breaker.record_failure()
+        raise
+    breaker.record_success()
+    return result
@@ -0,0 +1,166 @@
+"""
+Health Module
+
+Background monitoring of upstream (Gemini) health. A daemon thread probes
+the embedding and generation APIs on a fixed cadence and stores the result
+in MongoDB, so /api/status only ever reads cached state. A lease on the
+shared status document makes sure only one worker process probes per
+interval, however many workers are running.
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Any
+from pymongo.errors import DuplicateKeyError
+from . import gemini
+from .models import get_collection
+from .rate_limit import RateLimitedError
+
+STATUS_DOC_ID = 'upstream'
+
+# Seconds each probe call may take before it counts as failed
+PROBE_TIMEOUT = float(os.getenv('STATUS_PROBE_TIMEOUT', 3))
+
+UNKNOWN_STATUS = {
+    'gemini': 'unknown',
+    'embeddings': 'unknown'
+}
+
+
+def service_status():
+    """Get the service_status collection."""
+    return get_collection('service_status')
+
+
+def _classify_error(error: Exception) -> str:
+    """Map an upstream exception to a status string."""
+    if '429' in str(error) or 'quota' in str(error).lower():
+        return 'quota_exceeded'
+    return 'error'
+
+
+def _probe(call, previous: str) -> str:
+    """Run one probe call and map its outcome to a status string."""
+    try:
+        call()
+        return 'working'
+    except gemini.CircuitOpenError:
+        # Recent calls failed; report that without calling upstream again
+        return 'degraded'
+    except RateLimitedError:
+        # Chat traffic is using the rate limit; skip this probe
+        return previous
+    except Exception as e:
+        return _classify_error(e)
+
+
+def probe_upstream(previous: Dict[str, str] = None) -> Dict[str, str]:
+    """
+    Make one minimal embedding and generation call and report their health.
+
+    Probes go through the gemini wrappers at background priority, so they
+    respect the circuit breakers and leave the rate limit to chat traffic.
+
+    Args:
+        previous: Last reported status, kept for a probe the rate limiter sheds
+    """
+    previous = previous or UNKNOWN_STATUS
+    return {
+        # Try a simple embedding request
+        'embeddings': _probe(
+            lambda: gemini.embed_content(['test'], task_type="retrieval_document",
+                                         priority='background', timeout=PROBE_TIMEOUT),
+            previous.get('embeddings', 'unknown')
+        ),
+        # Try a simple generation request
+        'gemini': _probe(
+            lambda: gemini.generate_content('test', generation_config={'max_output_tokens': 1},
+                                            priority='background', timeout=PROBE_TIMEOUT),
+            previous.get('gemini', 'unknown')
+        )
+    }
+
+
+class HealthMonitor:
+    """Per-process cache of upstream health, refreshed by a background thread."""
+
+    def __init__(self):
+        self.interval = 60
+        self.app = None
+        self._status = {'api_status': dict(UNKNOWN_STATUS), 'checked_at': None}
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app) -> None:
+        """Register the monitor with a Flask app; the thread starts on first use."""
+        self.app = app
+        self.interval = int(app.config.get('STATUS_PROBE_INTERVAL', 60))
+        app.extensions['health_monitor'] = self
+
+    def _ensure_started(self) -> None:
+        """Start the refresher in this process (threads don't survive a fork)."""
+        if self.interval <= 0 or self.app is None:
+            return
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='health-monitor', daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    self.refresh()
+            except Exception as e:
+                print(f"Error refreshing upstream status: {str(e)}")
+            time.sleep(self.interval)
+
+    def refresh(self) -> None:
+        """Probe upstream if this process holds the lease, then reload the shared status."""
+        now = datetime.utcnow()
+        try:
+            # Claim the probe lease; fails if another worker probed recently
+            service_status().find_one_and_update(
+                {
+                    '_id': STATUS_DOC_ID,
+                    '$or': [
+                        {'next_probe_at': {'$lte': now}},
+                        {'next_probe_at': {'$exists': False}}
+                    ]
+                },
+                {'$set': {'next_probe_at': now + timedelta(seconds=self.interval)}},
+                upsert=True
+            )
+            claimed = True
+        except DuplicateKeyError:
+            claimed = False
+
+        if claimed:
+            service_status().update_one(
+                {'_id': STATUS_DOC_ID},
+                {'$set': {'api_status': probe_upstream(self._status['api_status']),
+                          'checked_at': datetime.utcnow()}}
+            )
+
+        doc = service_status().find_one({'_id': STATUS_DOC_ID}) or {}
+        if 'api_status' in doc:
+            self._status = {'api_status': doc['api_status'], 'checked_at': doc.get('checked_at')}
+
+    def get_status(self) -> Dict[str, Any]:
+        """Return the cached upstream status without doing any I/O."""
+        self._ensure_started()
+        checked_at = self._status['checked_at']
+        return {
+            'api_status': dict(self._status['api_status']),
+            'checked_at': checked_at.isoformat() if checked_at else None,
+            'refresh_interval': self.interval
+        }
+
+
+health_monitor = HealthMonitor()
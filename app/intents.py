@@ -0,0 +1,120 @@
+"""
+Intents Module
+
+Keyword-based intent classification for the rule-based (fallback) response
+path. Each table of intents and trigger phrases is compiled once at import
+into a single regular expression, so classifying a message is one pass over
+the lowercased text instead of a chain of `any(word in message ...)` scans.
+"""
+import re
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+class IntentMatcher:
+    """
+    Classify text by the first intent (in table order) whose phrases occur in it.
+
+    Phrases match as case-insensitive substrings, exactly like the
+    `any(word in message.lower() for word in [...])` chains this replaces,
+    and earlier intents take precedence over later ones regardless of where
+    in the text their phrases appear.
+    """
+
+    def __init__(self, intents: Sequence[Tuple[str, Sequence[str]]]):
+        """
+        Args:
+            intents: (name, phrases) pairs in precedence order
+        """
+        self.names: List[str] = [name for name, _ in intents]
+        self._phrases: Dict[str, int] = {}
+        for index, (_, words) in enumerate(intents):
+            for phrase in words:
+                phrase = phrase.lower()
+                self._phrases[phrase] = min(index, self._phrases.get(phrase, index))
+
+        self._intent_of = {phrase: self._best_intent(phrase) for phrase in self._phrases}
+        exact = self._add_overlap_phrases()
+
+        # Longest phrases first so the alternation prefers them
+        alternation = '|'.join(re.escape(p) for p in sorted(self._intent_of, key=len, reverse=True))
+        if exact:
+            self._pattern = re.compile(alternation)
+        else:
+            # Test every position without consuming text (exact, but slower)
+            self._pattern = re.compile(f'(?=({alternation}))')
+
+    def _best_intent(self, text: str) -> int:
+        """Best intent among the table phrases contained in text."""
+        return min((index for phrase, index in self._phrases.items() if phrase in text),
+                   default=len(self.names))
+
+    def _add_overlap_phrases(self, max_rounds: int = 5) -> bool:
+        """
+        Make a consuming, longest-first scan exact.
+
+        The scan resumes after each match, so a table phrase that starts
+        inside a match is skipped. Whenever that phrase could have a better
+        intent, the two overlapping phrases are added as one longer phrase;
+        the scan then prefers it, and it carries the better intent.
+
+        Returns:
+            bool: False if the tables didn't settle within max_rounds
+        """
+        for _ in range(max_rounds):
+            merged = {}
+            for first, first_intent in self._intent_of.items():
+                for second in self._phrases:
+                    if self._intent_of[second] >= first_intent:
+                        continue
+                    for size in range(1, min(len(first), len(second))):
+                        if first.endswith(second[:size]):
+                            combined = first + second[size:]
+                            if combined not in self._intent_of:
+                                merged[combined] = self._best_intent(combined)
+            if not merged:
+                return True
+            self._intent_of.update(merged)
+        return False
+
+    def match(self, text: str) -> Optional[str]:
+        """
+        Return the highest-precedence intent found in text, or None.
+
+        Args:
+            text: Message to classify
+        """
+        best = len(self.names)
+        for phrase in self._pattern.findall(text.lower()):
+            index = self._intent_of[phrase]
+            if index < best:
+                best = index
+        return self.names[best] if best < len(self.names) else None
+
+
+# Fallback reply intents, in precedence order
+FALLBACK_INTENTS = IntentMatcher([
+    ('personal_info', ['my name is', "i'm ", "i am ", "i'm from", "i live in"]),
+    ('tasks', ['task', 'todo', 'work', 'busy']),
+    ('tired', ['tired', 'exhausted', 'stressed']),
+    ('happy', ['happy', 'great', 'awesome', 'excited']),
+    ('question', ['?'])
+])
+
+# PersonalityTraits.get_response intents, in precedence order
+MESSAGE_INTENTS = IntentMatcher([
+    ('question', ['?']),
+    ('work', ['work', 'task', 'todo', 'do today']),
+    ('meet', ['meet', 'see', 'hang out', 'get together'])
+])
+
+QUESTION_INTENTS = IntentMatcher([
+    ('how_are_you', ['how are you', 'how do you do', "how's it going"]),
+    ('open', ['what', 'when', 'where', 'why', 'how', 'who', 'which']),
+    ('request', ['can you', 'could you', 'would you'])
+])
+
+STATEMENT_INTENTS = IntentMatcher([
+    ('feeling', ['i feel', "i'm feeling", 'i am feeling']),
+    ('need', ['i need', 'i want', 'i would like']),
+    ('opinion', ['i think', 'i believe', 'in my opinion'])
+])
@@ -0,0 +1,75 @@
+"""
+Local Embeddings Module
+
+Dependency-light embeddings used when the Gemini embedding API is unavailable.
+Texts are embedded with the hashing trick over character n-grams, computed for
+the whole batch at once with NumPy, so similar texts get similar vectors and
+the fallback path stays cheap under load.
+"""
+from typing import List, Tuple
+import numpy as np
+
+EMBEDDING_DIM = 768
+NGRAM_RANGE = (3, 5)
+
+# Multiplier and mixing constant for the rolling n-gram hash (64-bit, odd)
+_HASH_BASE = np.uint64(0x100000001B3)
+_HASH_MIX = np.uint64(0x9E3779B97F4A7C15)
+
+
+def _encode_batch(texts: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Concatenate normalized texts into one byte buffer with a per-byte row index."""
+    encoded = [f" {' '.join(text.lower().split())} ".encode('utf-8') for text in texts]
+    lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=len(encoded))
+    buffer = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    rows = np.repeat(np.arange(len(encoded), dtype=np.int64), lengths)
+    return buffer, rows
+
+
+def hashed_ngram_embeddings(texts: List[str], dim: int = EMBEDDING_DIM,
+                            ngram_range: Tuple[int, int] = NGRAM_RANGE) -> np.ndarray:
+    """
+    Embed texts as signed, hashed character n-gram counts.
+
+    Args:
+        texts: Texts to embed
+        dim: Dimensionality of the output vectors
+        ngram_range: Smallest and largest n-gram length (inclusive)
+
+    Returns:
+        np.ndarray: (len(texts), dim) float32 array of L2-normalized vectors
+    """
+    n_texts = len(texts)
+    if n_texts == 0:
+        return np.zeros((0, dim), dtype=np.float32)
+
+    buffer, rows = _encode_batch(texts)
+    values = buffer.astype(np.uint64)
+    counts = np.zeros(n_texts * dim, dtype=np.float64)
+
+    with np.errstate(over='ignore'):
+        for n in range(ngram_range[0], ngram_range[1] + 1):
+            if len(buffer) < n:
+                break
+
+            # Rolling polynomial hash over every window of n bytes
+            windows = np.lib.stride_tricks.sliding_window_view(values, n)
+            hashes = np.full(len(windows), np.uint64(n), dtype=np.uint64)
+            for j in range(n):
+                hashes = hashes * _HASH_BASE + windows[:, j]
+            hashes = (hashes ^ (hashes >> np.uint64(29))) * _HASH_MIX
+
+            # Drop windows that straddle two texts
+            starts = rows[:len(windows)]
+            valid = starts == rows[n - 1:]
+            hashes = hashes[valid]
+            starts = starts[valid]
+
+            buckets = (hashes % np.uint64(dim)).astype(np.int64)
+            signs = np.where((hashes >> np.uint64(63)) == 0, 1.0, -1.0)
+            counts += np.bincount(starts * dim + buckets, weights=signs, minlength=n_texts * dim)
+
+    embeddings = counts.reshape(n_texts, dim).astype(np.float32)
+    norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+    np.divide(embeddings, norms, out=embeddings, where=norms > 0)
+    return embeddings
@@ -2,35 +2,101 @@ import os
 from typing import List, Dict, Any, Optional
 import uuid
 from datetime import datetime
-import chromadb
-from chromadb.utils import embedding_functions
-import google.generativeai as genai
-from dotenv import load_dotenv
-from chromadb.config import Settings
+import threading
+from functools import partial
+import numpy as np
+from .config import env_flag
+from .embedding_cache import EmbeddingCache
+from .memory_queue import MemoryWriteQueue
+from .local_embeddings import hashed_ngram_embeddings
+from .vector_store import VectorStore, ChromaVectorStore, NumpyVectorStore, CachedVectorStore
+from .rate_limit import RateLimitedError
+from . import gemini
 
 # Disable ChromaDB telemetry
 os.environ['ANONYMIZED_TELEMETRY'] = 'False'
 os.environ['CHROMA_TELEMETRY_TESTING'] = 'True'
 
-# Load environment variables
-load_dotenv()
+# Default location of the persistent ChromaDB store
+DEFAULT_CHROMA_PATH = os.getenv('CHROMA_DB_PATH', os.path.join(os.getcwd(), 'chroma_db'))
 
-# Initialize Gemini
-GOOGLE_API_KEY = os.getenv('GOOGLE_API_KEY')
-if not GOOGLE_API_KEY:
-    raise ValueError("GOOGLE_API_KEY environment variable not set")
+# Gemini accepts at most 100 texts per batch embedding request
+MAX_EMBED_BATCH_SIZE = 100
 
-genai.configure(api_key=GOOGLE_API_KEY)
+def tag_key(tag: str) -> str:
+    """Metadata key marking a memory as carrying the given tag."""
+    return f"tag_{tag}"
+
+def build_where(user_id: Optional[str], tags: Optional[List[str]] = None) -> Optional[Dict[str, Any]]:
+    """Build a Chroma where clause matching the user and any of the given tags."""
+    conditions = []
+    if user_id:
+        conditions.append({"user_id": user_id})
+    if tags:
+        tag_conditions = [{tag_key(tag): 1} for tag in tags]
+        conditions.append(tag_conditions[0] if len(tag_conditions) == 1 else {"$or": tag_conditions})
+    
+    if not conditions:
+        return None
+    return conditions[0] if len(conditions) == 1 else {"$and": conditions}
+
+_chroma_clients = {}
+_chroma_lock = threading.Lock()
+
+def get_chroma_client(db_path: str = DEFAULT_CHROMA_PATH):
+    """Return the process-wide ChromaDB client for db_path, creating it on first use."""
+    db_path = os.path.abspath(db_path)
+    with _chroma_lock:
+        client = _chroma_clients.get(db_path)
+        if client is None:
+            import chromadb
+            from chromadb.config import Settings
+            client = chromadb.PersistentClient(
+                path=db_path,
+                settings=Settings(anonymized_telemetry=False)
+            )
+            _chroma_clients[db_path] = client
+        return client
 
 class MemorySystem:
-    def __init__(self):
-        """Initialize the memory system with ChromaDB collections."""
-        import os
-        import time
-        from pathlib import Path
+    def __init__(self, db_path: str = DEFAULT_CHROMA_PATH, store: Optional[VectorStore] = None):
+        """
+        Initialize the memory system.
         
-        self.embedding_model = 'models/embedding-001'  # Gemini's embedding model
-        db_path = os.path.join(os.getcwd(), 'chroma_db')
+        Args:
+            db_path: Location of the persistent ChromaDB store
+            store: Vector store to use instead of the one picked by VECTOR_STORE_BACKEND
+        """
+        self.embedding_model = gemini.EMBEDDING_MODEL  # Gemini's embedding model
+        self.embedding_cache = EmbeddingCache()
+        self.write_behind = env_flag('MEMORY_WRITE_BEHIND', False)
+        # Also takes synchronous writes that were rate limited, so it is
+        # started on first use when write-behind is off
+        self.write_queue = None
+        self._write_queue_lock = threading.Lock()
+        if self.write_behind:
+            self._get_write_queue()
+        
+        if store is None:
+            backend = os.getenv('VECTOR_STORE_BACKEND', 'chroma').lower()
+            if backend == 'numpy':
+                store = NumpyVectorStore()
+            else:
+                store = self._open_chroma_store(db_path)
+                # Keep actively chatting users' vectors in process
+                hot_cache_mb = int(os.getenv('MEMORY_HOT_CACHE_MB', 256))
+                if hot_cache_mb > 0:
+                    store = CachedVectorStore(
+                        store,
+                        max_bytes=hot_cache_mb * 1024 * 1024,
+                        ttl=float(os.getenv('MEMORY_HOT_CACHE_TTL', 300))
+                    )
+        self.store = store
+    
+    @staticmethod
+    def _open_chroma_store(db_path: str) -> ChromaVectorStore:
+        """Open the ChromaDB-backed store, retrying with exponential backoff."""
+        import time
         
         # Try to initialize with retries
         max_retries = 3
@@ -38,28 +104,11 @@ class MemorySystem:
         
         for attempt in range(max_retries):
             try:
-                # Clear the database directory if it exists and we're not on the first attempt
-                if attempt > 0 and os.path.exists(db_path):
-                    print(f"Attempt {attempt + 1}: Clearing ChromaDB directory...")
-                    try:
-                        import shutil
-                        shutil.rmtree(db_path)
-                        # Small delay to ensure the OS releases file handles
-                        time.sleep(1)
-                    except Exception as e:
-                        print(f"Warning: Could not clear ChromaDB directory: {e}")
-                
-                # Initialize ChromaDB client with the new API
+                # Share one ChromaDB client per store across the process
                 print(f"Attempt {attempt + 1}: Initializing ChromaDB...")
-                self.chroma_client = chromadb.PersistentClient(
-                    path=db_path,
-                    settings=Settings(anonymized_telemetry=False)
-                )
-                
-                # Try to access the collection
-                self.collection = self._get_or_create_collection()
+                store = ChromaVectorStore(get_chroma_client(db_path), "memories")
                 print("ChromaDB initialized successfully.")
-                return
+                return store
                 
             except Exception as e:
                 print(f"Error initializing ChromaDB (attempt {attempt + 1}/{max_retries}): {e}")
@@ -70,42 +119,62 @@ class MemorySystem:
                 time.sleep(retry_delay)
                 retry_delay *= 2  # Exponential backoff
         
-    def _get_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Get embeddings for a list of texts using Gemini with fallback."""
+    def _get_write_queue(self) -> MemoryWriteQueue:
+        """Return the write queue, starting its worker on first use."""
+        with self._write_queue_lock:
+            if self.write_queue is None:
+                self.write_queue = MemoryWriteQueue(
+                    partial(self._write_memories, priority="background"),
+                    max_size=int(os.getenv('MEMORY_WRITE_QUEUE_SIZE', 1000)),
+                    batch_size=int(os.getenv('MEMORY_WRITE_BATCH_SIZE', 32)),
+                    retry_on=(RateLimitedError,)
+                )
+            return self.write_queue
+    
+    def _get_embeddings(self, texts: List[str], task_type: str = "retrieval_document",
+                        priority: str = "interactive", shed_fallback: bool = True) -> List[List[float]]:
+        """Get embeddings for a list of texts using Gemini with fallback.
+
+        Texts that were embedded before are served from the embedding cache;
+        only the misses are sent to Gemini, rate limited at the given priority.
+        With shed_fallback=False a rate-limited call raises RateLimitedError
+        instead of returning local vectors, so callers that store the vectors
+        can retry rather than mix them with Gemini ones.
+        """
+        cached = self.embedding_cache.get_many(self.embedding_model, task_type, texts)
+        if len(cached) == len(texts):
+            return [cached[i] for i in range(len(texts))]
+        
+        missing = [i for i in range(len(texts)) if i not in cached]
+        missing_texts = [texts[i] for i in missing]
         try:
             # Use the Gemini embedding model
-            result = genai.embed_content(
+            result = gemini.embed_content(
+                missing_texts,
+                task_type=task_type,
                 model=self.embedding_model,
-                content=texts,
-                task_type="retrieval_document"
+                priority=priority
             )
-            return result['embedding'] if isinstance(result['embedding'][0], list) else [result['embedding']]
+            fetched = result['embedding'] if isinstance(result['embedding'][0], list) else [result['embedding']]
         except Exception as e:
+            if isinstance(e, RateLimitedError) and not shed_fallback:
+                raise
             print(f"Error getting embeddings: {str(e)}")
-            # Return simple hash-based vectors as fallback
-            return self._get_fallback_embeddings(texts)
-    
-    def _get_fallback_embeddings(self, texts: List[str]) -> List[List[float]]:
-        """Generate simple fallback embeddings based on text hashing."""
-        import hashlib
-        embeddings = []
-        for text in texts:
-            # Create a simple hash-based embedding
-            hash_obj = hashlib.md5(text.encode())
-            hash_bytes = hash_obj.digest()
-            # Convert to a 768-dimensional vector (repeated pattern)
-            vector = []
-            for i in range(768):
-                vector.append(float(hash_bytes[i % len(hash_bytes)]) / 255.0 - 0.5)
-            embeddings.append(vector)
+            # Return local n-gram vectors as fallback (never cached)
+            fetched = self._get_fallback_embeddings(missing_texts).tolist()
+        else:
+            self.embedding_cache.put_many(self.embedding_model, task_type, missing_texts, fetched)
+        
+        embeddings = [None] * len(texts)
+        for i, embedding in cached.items():
+            embeddings[i] = embedding
+        for i, embedding in zip(missing, fetched):
+            embeddings[i] = embedding
         return embeddings
     
-    def _get_or_create_collection(self):
-        """Get or create the ChromaDB collection for memory storage."""
-        try:
-            return self.chroma_client.get_collection("memories")
-        except ValueError:
-            return self.chroma_client.create_collection("memories")
+    def _get_fallback_embeddings(self, texts: List[str]) -> np.ndarray:
+        """Generate local hashed character n-gram embeddings as an (n, 768) float32 array."""
+        return hashed_ngram_embeddings(texts)
     
     def save_memory(self, user_id: str, text: str, tags: List[str], metadata: Optional[Dict] = None) -> str:
         """
@@ -120,27 +189,93 @@ class MemorySystem:
         Returns:
             str: The ID of the saved memory
         """
+        memory_id = str(uuid.uuid4())
+        metadata = self._build_metadata(user_id, tags, metadata)
+        memory = {'id': memory_id, 'text': text, 'metadata': metadata}
+        
+        # In write-behind mode the worker embeds and stores the memory later;
+        # fall back to a synchronous write when the queue is full
+        if not self.write_behind or not self.write_queue.put(memory):
+            self._write_now([memory])
+        
+        return memory_id
+    
+    @staticmethod
+    def _build_metadata(user_id: str, tags: List[str], metadata: Optional[Dict] = None) -> Dict[str, Any]:
+        """Add user, tag and timestamp fields to a memory's metadata.
+        
+        Besides the comma-joined "tags" string, every tag gets its own
+        "tag_<name>" key so that Chroma can filter by tag in the where clause.
+        """
         if metadata is None:
             metadata = {}
-            
-        memory_id = str(uuid.uuid4())
         metadata.update({
             "user_id": user_id,
             "tags": ",".join(tags),
             "created_at": datetime.utcnow().isoformat()
         })
+        metadata.update({tag_key(tag): 1 for tag in tags})
+        return metadata
+    
+    def _write_memories(self, memories: List[Dict[str, Any]], priority: str = "interactive") -> None:
+        """
+        Embed and store prepared memories with one embedding call and one store.add.
         
-        # Get embeddings for the text
-        embeddings = self._get_embeddings([text])
+        Raises:
+            RateLimitedError: If the embedding call was shed; nothing is stored
+        """
+        texts = [memory['text'] for memory in memories]
+        embeddings = self._get_embeddings(texts, priority=priority, shed_fallback=False)
         
-        self.collection.add(
-            documents=[text],
+        self.store.add(
+            documents=texts,
             embeddings=embeddings,
-            metadatas=[metadata],
-            ids=[memory_id]
+            metadatas=[memory['metadata'] for memory in memories],
+            ids=[memory['id'] for memory in memories]
         )
+    
+    def _write_now(self, memories: List[Dict[str, Any]]) -> None:
+        """Write memories on the calling thread, handing them to the write queue if rate limited."""
+        try:
+            self._write_memories(memories)
+        except RateLimitedError:
+            # All or nothing, so a caller retrying after the error can't duplicate memories
+            if not self._get_write_queue().put_many(memories):
+                raise
+    
+    def flush(self) -> None:
+        """Wait until all queued memory writes have been stored."""
+        if self.write_queue is not None:
+            self.write_queue.flush()
+    
+    def save_memories(self, user_id: str, items: List[Dict[str, Any]]) -> List[str]:
+        """
+        Save several memories at once.
         
-        return memory_id
+        Texts are embedded in chunks and each chunk is stored with a single
+        store.add, keeping every chunk within the store's max batch size.
+        
+        Args:
+            user_id: Unique identifier for the user
+            items: Dicts with 'text', 'tags' and optional 'metadata'
+            
+        Returns:
+            List[str]: The IDs of the saved memories, in input order
+        """
+        memories = []
+        for item in items:
+            metadata = self._build_metadata(user_id, item.get('tags', []), dict(item.get('metadata') or {}))
+            memories.append({'id': str(uuid.uuid4()), 'text': item['text'], 'metadata': metadata})
+        
+        chunk_size = self._max_batch_size()
+        for start in range(0, len(memories), chunk_size):
+            self._write_now(memories[start:start + chunk_size])
+        
+        return [memory['id'] for memory in memories]
+    
+    def _max_batch_size(self) -> int:
+        """Largest number of memories to embed and add in one call."""
+        return max(1, min(MAX_EMBED_BATCH_SIZE, self.store.max_batch_size))
     
     def query_memory(self, user_id: str, query: str, k: int = 5, tags: List[str] = None) -> List[Dict[str, Any]]:
         """
@@ -155,90 +290,140 @@ class MemorySystem:
         Returns:
             List of relevant memories with metadata
         """
+        return self.query_memories(user_id, [query], k, tags)[0]
+    
+    def query_memories(self, user_id: str, queries: List[str], k: int = 5, tags: List[str] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Query memories for several query texts in one round trip.
+        
+        All queries are embedded together and sent in a single store.query.
+        
+        Args:
+            user_id: User to query memories for
+            queries: The query texts
+            k: Number of results to return per query
+            tags: Optional list of tags to filter by
+            
+        Returns:
+            One list of relevant memories per query, in input order
+        """
+        if not queries:
+            return []
+        
         try:
-            # Get query embedding first
-            query_embedding = self._get_embeddings([query])[0]
+            # Get query embeddings first
+            query_embeddings = self._get_embeddings(queries)
                 
-            # Get all results first with a higher limit to account for filtering
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=max(10, k * 3),  # Get more results to account for filtering
-                where={"user_id": user_id} if user_id else None
+            # User and tag filtering happen inside the store, so k results are enough
+            results = self.store.query(
+                query_embeddings=query_embeddings,
+                n_results=k,
+                where=build_where(user_id, tags)
             )
             
-            # If no results found, return empty list
-            if not results or results.get('ids') is None or len(results['ids'][0]) == 0:
-                return []
+            # If no results found, return empty lists
+            if not results or results.get('ids') is None:
+                return [[] for _ in queries]
             
-            # Filter results by tags if specified
-            if tags and len(tags) > 0:
-                filtered_results = {
-                    'ids': [[]],
-                    'distances': [[]],
-                    'metadatas': [[]],
-                    'documents': [[]],
-                    'embeddings': [[]] if results.get('embeddings') else None
-                }
-                
-                for i in range(len(results['ids'][0])):
-                    if i >= len(results['metadatas'][0]):
-                        continue
-                        
-                    metadata = results['metadatas'][0][i]
-                    if metadata and 'tags' in metadata:
-                        memory_tags = metadata['tags'].split(',')
-                        if any(tag in memory_tags for tag in tags):
-                            filtered_results['ids'][0].append(results['ids'][0][i])
-                            filtered_results['distances'][0].append(results['distances'][0][i])
-                            filtered_results['metadatas'][0].append(metadata)
-                            filtered_results['documents'][0].append(results['documents'][0][i])
-                            if filtered_results['embeddings'] is not None and i < len(results['embeddings'][0]):
-                                filtered_results['embeddings'][0].append(results['embeddings'][0][i])
-                                
-                            # If we have enough results, break early
-                            if len(filtered_results['ids'][0]) >= k:
-                                break
-                
-                # If we have any filtered results, use them
-                if len(filtered_results['ids'][0]) > 0:
-                    results = filtered_results
-                    
-                # Trim to requested k results
-                for key in ['ids', 'distances', 'metadatas', 'documents']:
-                    if results.get(key) and len(results[key]) > 0:
-                        results[key] = [results[key][0][:k]]
-                if results.get('embeddings') and len(results['embeddings']) > 0:
-                    results['embeddings'] = [results['embeddings'][0][:k]]
-            
-            # If no results after filtering, return empty list
-            if not results.get('ids') or len(results['ids'][0]) == 0:
-                return []
-            
-            # Build memories list
-            memories = []
-            for i in range(min(len(results['ids'][0]), k)):
-                # Skip if we don't have all the required data
-                if (i >= len(results['metadatas'][0]) or 
-                    i >= len(results['documents'][0]) or 
-                    i >= len(results['distances'][0])):
-                    continue
-                    
-                memory = {
-                    'id': results['ids'][0][i],
-                    'text': results['documents'][0][i],
-                    'metadata': results['metadatas'][0][i],
-                    'distance': results['distances'][0][i]
-                }
-                memories.append(memory)
-                
-            return memories
+            return [self._format_results(results, row, k) for row in range(len(queries))]
             
         except Exception as e:
             print(f"Error querying memory: {str(e)}")
+            return [[] for _ in queries]
+    
+    def _format_results(self, results: Dict[str, Any], row: int, k: int) -> List[Dict[str, Any]]:
+        """Turn one row of a store.query result into a list of memories."""
+        if row >= len(results['ids']):
             return []
+        
+        ids = results['ids'][row]
+        metadatas = results['metadatas'][row]
+        documents = results['documents'][row]
+        distances = results['distances'][row]
+        
+        # Build memories list
+        memories = []
+        for i in range(min(len(ids), len(metadatas), len(documents), len(distances), k)):
+            memories.append({
+                'id': ids[i],
+                'text': documents[i],
+                'metadata': metadatas[i],
+                'distance': distances[i]
+            })
+            
+        return memories
+    
+    def migrate_tag_metadata(self, batch_size: int = 500) -> int:
+        """
+        One-time migration adding per-tag metadata keys to existing memories.
+        
+        Memories saved before tags were indexed only carry the comma-joined
+        "tags" string, which the where clause cannot match.
+        
+        Returns:
+            int: Number of memories updated
+        """
+        updated = 0
+        offset = 0
+        while True:
+            page = self.store.get(limit=batch_size, offset=offset)
+            ids = page.get('ids') or []
+            if not ids:
+                break
+            
+            changed_ids = []
+            changed_metadatas = []
+            for memory_id, metadata in zip(ids, page['metadatas']):
+                tags = [tag for tag in (metadata or {}).get('tags', '').split(',') if tag]
+                missing = {tag_key(tag): 1 for tag in tags if tag_key(tag) not in metadata}
+                if missing:
+                    changed_ids.append(memory_id)
+                    changed_metadatas.append({**metadata, **missing})
+            
+            if changed_ids:
+                self.store.update(ids=changed_ids, metadatas=changed_metadatas)
+                updated += len(changed_ids)
+            offset += len(ids)
+        
+        return updated
 
-# Create a singleton instance
-memory_system = MemorySystem()
+class LazyMemorySystem:
+    """
+    Process-wide MemorySystem that is only created on first use.
+    
+    Importing this module has no side effects; the app factory registers the
+    ChromaDB location with init_app() and the first attribute access builds
+    the underlying MemorySystem.
+    """
+    
+    def __init__(self):
+        self._instance = None
+        self._lock = threading.Lock()
+        self.db_path = DEFAULT_CHROMA_PATH
+    
+    def init_app(self, app) -> None:
+        """Register the memory system with a Flask app."""
+        self.db_path = app.config.get('CHROMA_DB_PATH', DEFAULT_CHROMA_PATH)
+        app.extensions['memory_system'] = self
+    
+    def get(self) -> MemorySystem:
+        """Return the MemorySystem, creating it on first call."""
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self._instance = MemorySystem(self.db_path)
+        return self._instance
+    
+    @property
+    def initialized(self) -> bool:
+        """Whether the MemorySystem has been created yet."""
+        return self._instance is not None
+    
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
+
+# Create a singleton instance (initialized lazily)
+memory_system = LazyMemorySystem()
 
 def save_memory(user_id: str, text: str, tags: List[str], metadata: Optional[Dict] = None) -> str:
     """Save a memory (public interface)."""
@@ -247,3 +432,11 @@ def save_memory(user_id: str, text: str, tags: List[str], metadata: Optional[Dic
 def query_memory(user_id: str, query: str, k: int = 5, tags: List[str] = None) -> List[Dict[str, Any]]:
     """Query memories (public interface)."""
     return memory_system.query_memory(user_id, query, k, tags)
+
+def save_memories(user_id: str, items: List[Dict[str, Any]]) -> List[str]:
+    """Save several memories (public interface)."""
+    return memory_system.save_memories(user_id, items)
+
+def query_memories(user_id: str, queries: List[str], k: int = 5, tags: List[str] = None) -> List[List[Dict[str, Any]]]:
+    """Query memories for several queries (public interface)."""
+    return memory_system.query_memories(user_id, queries, k, tags)
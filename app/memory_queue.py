@@ -0,0 +1,176 @@
+"""
+Memory Write Queue Module
+
+Write-behind queue for vector memory saves. Requests enqueue the memory and
+return immediately; a background worker groups queued saves into a single
+multi-text embedding call and a single collection.add. Batches that fail
+with a retryable error (e.g. the embedding call was rate limited) are put
+back on the queue after a growing backoff, and dropped after a few tries.
+"""
+import atexit
+import queue
+import threading
+import time
+from typing import Callable, List, Dict, Any, Tuple, Type
+
+
+class MemoryWriteQueue:
+    """Bounded queue drained by a background worker in batches."""
+
+    def __init__(self, write_batch: Callable[[List[Dict[str, Any]]], None],
+                 max_size: int = 1000, batch_size: int = 32, max_wait: float = 0.5,
+                 retry_on: Tuple[Type[Exception], ...] = (), max_attempts: int = 5,
+                 retry_backoff: float = 1.0, max_backoff: float = 30.0):
+        """
+        Initialize the queue and start its worker thread.
+
+        Args:
+            write_batch: Callable that persists a list of prepared memories
+            max_size: Maximum number of pending memories
+            batch_size: Maximum number of memories written per batch
+            max_wait: Seconds to wait for a batch to fill before writing it
+            retry_on: Exception types after which a batch is re-queued rather than dropped
+            max_attempts: Writes tried per memory before a retryable failure drops it
+            retry_backoff: Seconds to pause after the first retryable failure; doubles
+                with each consecutive failure
+            max_backoff: Longest pause between retries
+        """
+        self._write_batch = write_batch
+        self._queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self._retry_on = retry_on
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.max_backoff = max_backoff
+        self._failures = 0
+        # Serializes puts so a room check stays valid until the items are in
+        self._put_lock = threading.Lock()
+        self._closed = False
+        self._stopping = threading.Event()
+        self.stats = {
+            'enqueued': 0,
+            'written': 0,
+            'batches': 0,
+            'retried': 0,
+            'failed': 0
+        }
+
+        self._worker = threading.Thread(target=self._run, name='memory-write-queue', daemon=True)
+        self._worker.start()
+        atexit.register(self.close)
+
+    def put(self, item: Dict[str, Any]) -> bool:
+        """
+        Enqueue a prepared memory.
+
+        Returns:
+            bool: False if the queue is full or closed and the caller should write synchronously
+        """
+        return self.put_many([item])
+
+    def put_many(self, items: List[Dict[str, Any]]) -> bool:
+        """
+        Enqueue prepared memories all together or not at all.
+
+        Returns:
+            bool: False if the queue is closed or lacks room for every item, in
+                which case nothing was enqueued
+        """
+        if self._closed:
+            return False
+        with self._put_lock:
+            if self._queue.maxsize - self._queue.qsize() < len(items):
+                return False
+            for item in items:
+                self._queue.put_nowait((1, item))
+        self.stats['enqueued'] += len(items)
+        return True
+
+    def _run(self) -> None:
+        """Worker loop: collect up to batch_size items, then write them together."""
+        while True:
+            entry = self._queue.get()
+            if entry is None:
+                self._queue.task_done()
+                return
+
+            entries = [entry]
+            stop = False
+            deadline = time.monotonic() + self.max_wait
+            while len(entries) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                entries.append(entry)
+
+            batch = [item for _, item in entries]
+            try:
+                self._write_batch(batch)
+                self._failures = 0
+                self.stats['written'] += len(batch)
+                self.stats['batches'] += 1
+            except self._retry_on as e:
+                if stop or self._closed:
+                    self.stats['failed'] += len(batch)
+                    print(f"Dropping memory batch of {len(batch)} at shutdown: {str(e)}")
+                else:
+                    print(f"Retrying memory batch of {len(batch)} later: {str(e)}")
+                    self._requeue(entries)
+            except Exception as e:
+                self.stats['failed'] += len(batch)
+                print(f"Error writing memory batch of {len(batch)}: {str(e)}")
+            finally:
+                for _ in range(len(entries) + (1 if stop else 0)):
+                    self._queue.task_done()
+
+            if stop:
+                return
+
+    def _requeue(self, entries: List[Tuple[int, Dict[str, Any]]]) -> None:
+        """
+        Back off, then put a failed batch back at the end of the queue.
+
+        Memories that have used up their attempts, or no longer fit, are dropped.
+        """
+        self._failures += 1
+        backoff = min(self.max_backoff, self.retry_backoff * 2 ** (self._failures - 1))
+        # close() cuts the pause short so shutdown isn't held up
+        self._stopping.wait(backoff)
+
+        with self._put_lock:
+            for attempts, item in entries:
+                if attempts >= self.max_attempts or self._closed:
+                    self.stats['failed'] += 1
+                    continue
+                try:
+                    self._queue.put_nowait((attempts + 1, item))
+                    self.stats['retried'] += 1
+                except queue.Full:
+                    self.stats['failed'] += 1
+
+    def flush(self) -> None:
+        """Block until every memory enqueued so far has been written."""
+        self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending memories and stop the worker."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stopping.set()
+        self._queue.put(None)
+        self._worker.join()
+
+    def get_stats(self) -> Dict[str, int]:
+        """Return queue counters and current depth."""
+        stats = dict(self.stats)
+        stats['pending'] = self._queue.qsize()
+        return stats
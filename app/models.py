@@ -1,8 +1,13 @@
+import os
+from collections import deque
 from datetime import datetime
 from typing import List, Dict, Optional, Any
 from bson import ObjectId
+from pymongo import UpdateOne
+from pymongo.write_concern import WriteConcern
 from flask import current_app
 from .extensions import mongo
+from .cache import TTLCache, MISSING
 
 # Database collections
 def get_collection(name):
@@ -19,8 +24,72 @@ def daily_plans():
     return get_collection('daily_plans')
 
 def chat_messages():
-    """Get the chat_messages collection."""
-    return get_collection('chat_messages')
+    """Get the chat_messages collection, using the configured chat write concern."""
+    return get_collection('chat_messages').with_options(write_concern=CHAT_WRITE_CONCERN)
+
+def open_tasks():
+    """Get the open_tasks collection."""
+    return get_collection('open_tasks')
+
+def personality_sessions():
+    """Get the personality_sessions collection."""
+    return get_collection('personality_sessions')
+
+def profile_memories():
+    """Get the profile_memories collection."""
+    return get_collection('profile_memories')
+
+def migrations():
+    """Get the migrations collection (one document per completed backfill)."""
+    return get_collection('migrations')
+
+def _parse_write_concern(value: str) -> WriteConcern:
+    """Build a WriteConcern from a `w` value such as "1", "0" or "majority"."""
+    return WriteConcern(w=int(value) if value.isdigit() else value)
+
+# Write concern for chat log inserts (e.g. "0" to not wait for acknowledgement)
+CHAT_WRITE_CONCERN = _parse_write_concern(os.getenv('CHAT_WRITE_CONCERN', '1'))
+
+# Fields returned for a profile memory
+MEMORY_PROJECTION = {'_id': 0, 'type': 1, 'content': 1, 'tags': 1, 'importance': 1, 'created_at': 1}
+
+# Profiles are cached across requests and threads (context sources read them
+# on pool threads); every profile write invalidates the cached views
+_profile_cache = TTLCache(
+    ttl=float(os.getenv('PROFILE_CACHE_TTL', 30)),
+    max_items=int(os.getenv('PROFILE_CACHE_SIZE', 10000))
+)
+
+# Which one-time migrations have completed, rechecked at most once a minute
+_completed_migrations = TTLCache(ttl=60.0, max_items=100)
+
+# Projections for each cached profile view
+PROFILE_VIEWS = {
+    'full': None,
+    'summary': {'memories': 0}
+}
+
+def migration_completed(name: str) -> bool:
+    """Check whether the named one-time migration has recorded its completion."""
+    completed = _completed_migrations.get(name)
+    if completed is MISSING:
+        completed = migrations().find_one({'_id': name}, {'_id': 1}) is not None
+        _completed_migrations.set(name, completed)
+    return completed
+
+def mark_migration_completed(name: str, **details) -> None:
+    """Record that the named one-time migration has finished."""
+    migrations().update_one(
+        {'_id': name},
+        {'$set': {'completed_at': datetime.utcnow(), **details}},
+        upsert=True
+    )
+    _completed_migrations.invalidate(name)
+
+def _invalidate_profile(user_id: str) -> None:
+    """Drop every view of a profile from the shared cache."""
+    for view in PROFILE_VIEWS:
+        _profile_cache.invalidate((user_id, view))
 
 class UserProfile:
     """User profile model with enhanced personal details and memory capabilities."""
@@ -44,18 +113,56 @@ class UserProfile:
                 }
             },
             'answers': answers,
-            'memories': [],
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
         result = user_profiles().insert_one(profile)
         profile['_id'] = str(result.inserted_id)
+        _invalidate_profile(user_id)
         return profile
     
     @staticmethod
     def get_by_user_id(user_id: str) -> dict:
-        """Get a user profile by user ID."""
-        profile = user_profiles().find_one({'user_id': user_id})
+        """
+        Get a user profile by user ID.
+        
+        Reads are served from the shared TTL cache, and only on a miss from
+        MongoDB. The returned dict is a shallow copy; treat
+        nested values as read-only. `memories` holds every profile memory,
+        from profile_memories plus any not yet migrated out of the profile;
+        callers that don't need them should use get_summary instead.
+        """
+        return UserProfile._get_cached(user_id, 'full')
+    
+    @staticmethod
+    def get_summary(user_id: str) -> dict:
+        """
+        Get a user profile without its embedded memories.
+        
+        Returns the same fields as get_by_user_id (personal_info, answers,
+        check-ins, timestamps) except `memories`, which is excluded by a
+        projection so the read stays small however many memories a user has.
+        """
+        return UserProfile._get_cached(user_id, 'summary')
+    
+    @staticmethod
+    def _get_cached(user_id: str, view: str) -> dict:
+        """Read a profile view through the shared cache."""
+        key = (user_id, view)
+        profile = _profile_cache.get(key)
+        if profile is MISSING:
+            profile = UserProfile._load(user_id, PROFILE_VIEWS[view])
+            if profile is not None:
+                _profile_cache.set(key, profile)
+        
+        if profile is None:
+            return None
+        return dict(profile)
+    
+    @staticmethod
+    def _load(user_id: str, projection: Optional[dict] = None) -> dict:
+        """Read a user profile from MongoDB, filling in missing fields."""
+        profile = user_profiles().find_one({'user_id': user_id}, projection)
         if profile and '_id' in profile:
             profile['_id'] = str(profile['_id'])
             
@@ -74,8 +181,12 @@ class UserProfile:
                         'topics': []
                     }
                 }
-            if 'memories' not in profile:
-                profile['memories'] = []
+            if projection is None:
+                # Memories live in profile_memories; profiles that haven't been
+                # migrated yet may still embed older ones
+                embedded = profile.get('memories') or []
+                cursor = profile_memories().find({'user_id': user_id}, MEMORY_PROJECTION)
+                profile['memories'] = embedded + list(cursor.sort('created_at', 1))
                 
         return profile
     
@@ -87,15 +198,17 @@ class UserProfile:
             {'user_id': user_id},
             {'$set': updates}
         )
+        _invalidate_profile(user_id)
         return result.modified_count > 0
     
     @staticmethod
     def add_memory(user_id: str, memory_type: str, content: str, importance: int = 1, tags: list = None) -> bool:
-        """Add a new memory to the user's profile."""
+        """Add a new memory for the user (stored in the profile_memories collection)."""
         if tags is None:
             tags = []
             
         memory = {
+            'user_id': user_id,
             'type': memory_type,
             'content': content,
             'tags': tags,
@@ -103,49 +216,137 @@ class UserProfile:
             'created_at': datetime.utcnow()
         }
         
-        result = user_profiles().update_one(
-            {'user_id': user_id},
-            {
-                '$push': {'memories': memory},
-                '$set': {'updated_at': datetime.utcnow()}
-            }
+        result = profile_memories().insert_one(memory)
+        _invalidate_profile(user_id)
+        return result.inserted_id is not None
+    
+    @staticmethod
+    def claim_checkin(user_id: str, kind: str, day: str = None) -> Optional[dict]:
+        """
+        Record that a check-in of the given kind happened today.
+        
+        The check and the write are a single find_one_and_update, so two
+        concurrent requests can't both claim the same check-in.
+        
+        Args:
+            user_id: The user's unique identifier
+            kind: Check-in kind, e.g. 'morning' or 'evening'
+            day: ISO date to record (defaults to today, UTC)
+            
+        Returns:
+            The profile's personal_info if the check-in was claimed, None if it
+            already happened today or the user has no profile
+        """
+        if day is None:
+            day = datetime.utcnow().date().isoformat()
+        
+        field = f'checkins.{kind}'
+        profile = user_profiles().find_one_and_update(
+            {'user_id': user_id, field: {'$ne': day}},
+            {'$set': {field: day}},
+            projection={'_id': 0, 'personal_info': 1}
         )
-        return result.modified_count > 0
+        if profile is None:
+            return None
+        _invalidate_profile(user_id)
+        return profile.get('personal_info', {})
     
     @staticmethod
     def get_relevant_memories(user_id: str, query: str = None, limit: int = 5) -> list:
         """Get relevant memories for the user, optionally filtered by query."""
-        profile = user_profiles().find_one({'user_id': user_id})
-        if not profile or 'memories' not in profile:
-            return []
-            
-        memories = profile.get('memories', [])
-        
         # If no query, return most recent memories
         if not query:
-            return sorted(memories, key=lambda x: x.get('created_at', datetime.min), reverse=True)[:limit]
+            cursor = profile_memories().find({'user_id': user_id}, MEMORY_PROJECTION)
+            memories = list(cursor.sort('created_at', -1).limit(limit))
+        else:
+            # Keyword lookup runs on the (user_id, text) index; Mongo ranks the
+            # matches by importance and recency and returns only the top rows
+            cursor = profile_memories().find(
+                {'user_id': user_id, '$text': {'$search': query}},
+                MEMORY_PROJECTION
+            )
+            memories = list(cursor.sort([('importance', -1), ('created_at', -1)]).limit(limit))
+        
+        if UserProfile.memories_migrated():
+            return memories
+        
+        # Until migrate_profile_memories.py has run, older memories are still
+        # embedded in the profile; rank them together with the new ones
+        memories += UserProfile._match_embedded_memories(user_id, query)
+        if query:
+            rank = lambda m: (m.get('importance', 0), m.get('created_at', datetime.min))
+        else:
+            rank = lambda m: m.get('created_at', datetime.min)
+        return sorted(memories, key=rank, reverse=True)[:limit]
+    
+    @staticmethod
+    def _match_embedded_memories(user_id: str, query: str = None) -> list:
+        """Memories still embedded in the user's profile, filtered by keyword."""
+        profile = user_profiles().find_one({'user_id': user_id}, {'_id': 0, 'memories': 1}) or {}
+        memories = [m for m in profile.get('memories') or [] if isinstance(m, dict)]
+        if query:
+            query = query.lower()
+            memories = [
+                m for m in memories
+                if query in m.get('content', '').lower()
+                or any(query in tag.lower() for tag in m.get('tags', []))
+                or query in m.get('type', '').lower()
+            ]
+        fields = [field for field, included in MEMORY_PROJECTION.items() if included]
+        return [{field: m[field] for field in fields if field in m} for m in memories]
+    
+    @staticmethod
+    def migrate_embedded_memories() -> int:
+        """
+        Move memories embedded in user_profiles.memories into profile_memories.
+        
+        Each memory is upserted on (user_id, created_at, content), so the
+        migration can be re-run safely after an interruption.
+        
+        Returns:
+            int: Number of memories moved
+        """
+        moved = 0
+        for profile in user_profiles().find({'memories': {'$exists': True}}, {'user_id': 1, 'memories': 1}):
+            user_id = profile['user_id']
+            requests = []
+            for memory in profile.get('memories') or []:
+                key = {
+                    'user_id': user_id,
+                    'created_at': memory.get('created_at', datetime.min),
+                    'content': memory.get('content', '')
+                }
+                fields = {
+                    'type': memory.get('type', ''),
+                    'tags': memory.get('tags', []),
+                    'importance': memory.get('importance', 1)
+                }
+                requests.append(UpdateOne(key, {'$setOnInsert': fields}, upsert=True))
             
-        # Simple keyword matching for now
-        # In a real app, you'd want to use vector similarity search here
-        query = query.lower()
-        relevant = []
-        
-        for memory in memories:
-            content = memory.get('content', '').lower()
-            tags = [t.lower() for t in memory.get('tags', [])]
+            if requests:
+                profile_memories().bulk_write(requests, ordered=False)
+                moved += len(requests)
             
-            if (query in content or 
-                any(query in tag for tag in tags) or
-                query in memory.get('type', '').lower()):
-                relevant.append(memory)
-                
-        # Sort by importance and recency
-        relevant.sort(key=lambda x: (
-            -x.get('importance', 0),
-            x.get('created_at', datetime.min)
-        ))
+            user_profiles().update_one({'_id': profile['_id']}, {'$unset': {'memories': ''}})
+            _invalidate_profile(user_id)
         
-        return relevant[:limit]
+        mark_migration_completed('profile_memories', memories=moved)
+        return moved
+    
+    @staticmethod
+    def memories_migrated() -> bool:
+        """
+        Check whether migrate_embedded_memories has run.
+        
+        Until it has, older memories are still embedded in user_profiles and
+        reads must look there as well as in profile_memories.
+        """
+        return migration_completed('profile_memories')
+    
+    @staticmethod
+    def cache_stats() -> Dict[str, Any]:
+        """Hit rate and size of the shared profile cache."""
+        return _profile_cache.get_stats()
 
 class DailyPlan:
     """Daily plan model."""
@@ -163,6 +364,7 @@ class DailyPlan:
         }
         result = daily_plans().insert_one(plan)
         plan['_id'] = str(result.inserted_id)
+        DailyPlan._sync_open_tasks(user_id, date, tasks)
         return plan
     
     @staticmethod
@@ -191,6 +393,9 @@ class DailyPlan:
             upsert=True
         )
         
+        if 'tasks' in updates:
+            DailyPlan._sync_open_tasks(user_id, date, updates['tasks'])
+        
         if result.upserted_id:
             return {'_id': str(result.upserted_id), **updates}
         
@@ -200,97 +405,194 @@ class DailyPlan:
         return plan
         
     @staticmethod
-    def get_incomplete_tasks_before(user_id: str, before_date: datetime) -> List[Dict]:
+    def _sync_open_tasks(user_id: str, date: str, tasks: list) -> None:
+        """Replace the open_tasks rows for one plan with its incomplete tasks."""
+        rows = []
+        for task in tasks if isinstance(tasks, list) else []:
+            if isinstance(task, str):
+                task = {'description': task}
+            elif not isinstance(task, dict) or task.get('completed') is True:
+                continue
+            rows.append({
+                'user_id': user_id,
+                'plan_date': date,
+                'task_id': str(task.get('id') or task.get('_id') or ObjectId()),
+                'description': task.get('description') or task.get('text') or task.get('name') or 'Unnamed task'
+            })
+        
+        open_tasks().delete_many({'user_id': user_id, 'plan_date': date})
+        if rows:
+            open_tasks().insert_many(rows)
+    
+    @staticmethod
+    def get_open_tasks_before(user_id: str, before_date: datetime, limit: Optional[int] = None) -> List[Dict]:
         """
-        Get all incomplete tasks before a specific date.
+        Get incomplete tasks from plans dated before a specific day.
+        
+        Reads the open_tasks collection, which only holds incomplete tasks, so
+        the cost depends on the number of open tasks rather than on how many
+        plans the user has ever made.
         
         Args:
             user_id: The user's unique identifier
-            before_date: Get tasks before this date
+            before_date: Get tasks from plans before this day
+            limit: Maximum number of tasks to return, or None for all
             
         Returns:
-            List of tasks with their plan dates
+            List of tasks with their plan dates, oldest first
         """
         try:
-            # Find all plans before the specified date
-            plans = daily_plans().find({
-                'user_id': user_id,
-                'date': {'$lt': before_date.isoformat()}
-            })
+            cursor = open_tasks().find(
+                {'user_id': user_id, 'plan_date': {'$lt': before_date.date().isoformat()}},
+                {'_id': 0, 'plan_date': 1, 'task_id': 1, 'description': 1}
+            ).sort('plan_date', 1)
+            if limit is not None:
+                cursor = cursor.limit(limit)
             
-            incomplete_tasks = []
+            tasks = []
+            for row in cursor:
+                plan_date = datetime.fromisoformat(row['plan_date'])
+                tasks.append({
+                    'description': row['description'],
+                    'due_date': plan_date,
+                    'plan_date': plan_date,
+                    'task_id': row['task_id']
+                })
+            return tasks
             
-            for plan in plans:
-                if not isinstance(plan, dict):
-                    current_app.logger.warning(f"Unexpected plan format: {plan}")
-                    continue
-                    
-                try:
-                    # Handle both string and datetime plan dates
-                    plan_date = plan.get('date')
-                    if isinstance(plan_date, str):
-                        plan_date = datetime.fromisoformat(plan_date)
-                    elif not isinstance(plan_date, datetime):
-                        plan_date = datetime.utcnow()
-                        
-                    tasks = plan.get('tasks', [])
-                    if not isinstance(tasks, list):
-                        current_app.logger.warning(f"Unexpected tasks format in plan {plan.get('_id')}: {tasks}")
-                        continue
-                    
-                    for task in tasks:
-                        try:
-                            # Handle both string and dictionary tasks
-                            if isinstance(task, str):
-                                # Convert string tasks to dictionary format
-                                task = {
-                                    'description': task,
-                                    'completed': False,
-                                    'id': str(ObjectId())
-                                }
-                            elif not isinstance(task, dict):
-                                current_app.logger.debug(f"Skipping non-string/dict task: {task}")
-                                continue
-                                
-                            # Check if task is incomplete (completed is either False or not set)
-                            completed = task.get('completed')
-                            if completed is True:
-                                continue
-                                
-                            # Get task description, default to 'Unnamed task' if not available
-                            description = task.get('description')
-                            if not description:
-                                if 'text' in task:  # Try alternate field names
-                                    description = task['text']
-                                elif 'name' in task:
-                                    description = task['name']
-                                else:
-                                    description = 'Unnamed task'
-                            
-                            incomplete_tasks.append({
-                                'description': description,
-                                'due_date': plan_date,
-                                'plan_date': plan_date,
-                                'task_id': str(task.get('id') or task.get('_id') or ''),
-                                'raw_task': task  # Include raw task for debugging
-                            })
-                            
-                        except Exception as task_error:
-                            current_app.logger.error(f"Error processing task {task}: {str(task_error)}", 
-                                                  exc_info=True)
-                            continue
-                            
-                except Exception as plan_error:
-                    current_app.logger.error(f"Error processing plan {plan.get('_id')}: {str(plan_error)}", 
-                                          exc_info=True)
-                    continue
+        except Exception as e:
+            current_app.logger.error(f"Error in get_open_tasks_before: {str(e)}", exc_info=True)
+            return []
+    
+    @staticmethod
+    def count_open_tasks_before(user_id: str, before_date: datetime) -> int:
+        """Count incomplete tasks from plans dated before a specific day, using the open_tasks index."""
+        return open_tasks().count_documents(
+            {'user_id': user_id, 'plan_date': {'$lt': before_date.date().isoformat()}}
+        )
+    
+    @staticmethod
+    def rebuild_open_tasks() -> int:
+        """
+        Rebuild the open_tasks collection from the full plan history.
+        
+        Returns:
+            int: Number of plans indexed
+        """
+        count = 0
+        for plan in daily_plans().find({}, {'user_id': 1, 'date': 1, 'tasks': 1}):
+            if isinstance(plan.get('date'), str):
+                DailyPlan._sync_open_tasks(plan['user_id'], plan['date'], plan.get('tasks', []))
+                count += 1
+        
+        mark_migration_completed('open_tasks', plans=count)
+        return count
+    
+    @staticmethod
+    def open_tasks_backfilled() -> bool:
+        """
+        Check whether rebuild_open_tasks has indexed the existing plan history.
+        
+        Until it has, open_tasks only holds plans written since it was
+        introduced, and get_open_tasks_before would miss older tasks.
+        """
+        return migration_completed('open_tasks')
+    
+    @staticmethod
+    def get_incomplete_tasks_before(user_id: str, before_date: datetime,
+                                    limit: Optional[int] = 100) -> List[Dict]:
+        """
+        Get incomplete tasks from plans dated before a specific day.
+        
+        Filtering, unwinding and normalization of task shapes run in a MongoDB
+        aggregation pipeline, so only incomplete tasks (at most `limit`) are
+        sent back instead of whole plan documents.
+        
+        The result is cut off at `limit` without any marker: a user with more
+        incomplete tasks gets only those from the oldest plans, so the length
+        of the list is not their total. Pass limit=None to get every task.
+        
+        Args:
+            user_id: The user's unique identifier
+            before_date: Get tasks from plans before this day
+            limit: Maximum number of tasks to return, oldest plans first, or None
             
+        Returns:
+            List of tasks with their plan dates
+        """
+        pipeline = [
+            {'$match': {'user_id': user_id, 'date': {'$lt': before_date.date().isoformat()}}},
+            {'$sort': {'date': 1}},
+            {'$project': {'date': 1, 'tasks': 1}},
+            {'$unwind': '$tasks'},
+            {'$match': {
+                'tasks': {'$type': ['string', 'object']},
+                'tasks.completed': {'$ne': True}
+            }},
+            *([{'$limit': limit}] if limit is not None else []),
+            {'$project': {
+                '_id': 0,
+                'date': 1,
+                'raw_task': '$tasks',
+                'description': {'$cond': [
+                    {'$eq': [{'$type': '$tasks'}, 'string']},
+                    '$tasks',
+                    {'$ifNull': ['$tasks.description',
+                                 {'$ifNull': ['$tasks.text',
+                                              {'$ifNull': ['$tasks.name', 'Unnamed task']}]}]}
+                ]},
+                'task_id': {'$toString': {'$ifNull': ['$tasks.id', {'$ifNull': ['$tasks._id', '']}]}}
+            }}
+        ]
+        
+        try:
+            incomplete_tasks = []
+            for row in daily_plans().aggregate(pipeline):
+                plan_date = row.get('date')
+                if isinstance(plan_date, str):
+                    plan_date = datetime.fromisoformat(plan_date)
+                else:
+                    plan_date = datetime.utcnow()
+                
+                raw_task = row['raw_task']
+                if isinstance(raw_task, str):
+                    raw_task = {'description': raw_task, 'completed': False}
+                
+                incomplete_tasks.append({
+                    'description': row['description'] or 'Unnamed task',
+                    'due_date': plan_date,
+                    'plan_date': plan_date,
+                    'task_id': row['task_id'],
+                    'raw_task': raw_task  # Include raw task for debugging
+                })
             return incomplete_tasks
             
         except Exception as e:
             current_app.logger.error(f"Error in get_incomplete_tasks_before: {str(e)}", exc_info=True)
             return []
 
+# Last few messages per user, appended on every chat write so prompt history
+# needs no database read. Entries expire after a TTL and are reloaded from
+# the log, which bounds how stale a worker can be about turns written by
+# other workers.
+RECENT_MESSAGES_SIZE = int(os.getenv('CHAT_HISTORY_BUFFER_SIZE', 10))
+_recent_messages = TTLCache(
+    ttl=float(os.getenv('CHAT_HISTORY_BUFFER_TTL', 60)),
+    max_items=10000
+)
+
+def _remember_messages(user_id: str, messages: List[dict]) -> None:
+    """Append newly written messages to the user's buffer, if it is loaded."""
+    buffer = _recent_messages.get(user_id)
+    if buffer is MISSING:
+        return
+    for message in messages:
+        buffer.append({
+            'role': message['role'],
+            'content': message['content'],
+            'timestamp': message['timestamp'].isoformat()
+        })
+
 class ChatMessage:
     """Chat message model."""
     
@@ -306,14 +608,74 @@ class ChatMessage:
         }
         result = chat_messages().insert_one(message)
         message['_id'] = str(result.inserted_id)
+        _remember_messages(user_id, [message])
         return message
     
     @staticmethod
-    def get_user_messages(user_id: str, limit: int = 50) -> list:
-        """Get recent chat messages for a user."""
+    def create_turn(user_id: str, user_content: str, assistant_content: str,
+                    user_timestamp: datetime = None) -> List[dict]:
+        """
+        Persist a user message and the assistant's reply in one round trip.
+        
+        Args:
+            user_id: The user's unique identifier
+            user_content: The user's message
+            assistant_content: The assistant's reply
+            user_timestamp: When the user message was received (defaults to now)
+            
+        Returns:
+            The two saved messages, user message first
+        """
+        now = datetime.utcnow()
+        messages = [
+            {
+                'user_id': user_id,
+                'role': 'user',
+                'content': user_content,
+                'timestamp': user_timestamp or now
+            },
+            {
+                'user_id': user_id,
+                'role': 'assistant',
+                'content': assistant_content,
+                'timestamp': now
+            }
+        ]
+        result = chat_messages().insert_many(messages, ordered=True)
+        for message, inserted_id in zip(messages, result.inserted_ids):
+            message['_id'] = str(inserted_id)
+        _remember_messages(user_id, messages)
+        return messages
+    
+    @staticmethod
+    def get_user_messages(user_id: str, limit: int = 50, before: datetime = None,
+                          after: datetime = None) -> list:
+        """
+        Get a page of chat messages for a user, newest first.
+        
+        Pages are served by the (user_id, timestamp) index. With `after`, the
+        page holds the oldest `limit` messages newer than the cursor, so a
+        client can catch up by repeatedly passing its newest timestamp.
+        
+        Args:
+            user_id: The user's unique identifier
+            limit: Maximum number of messages to return
+            before: Only return messages older than this timestamp
+            after: Only return messages newer than this timestamp
+        """
+        query = {'user_id': user_id}
+        if before is not None or after is not None:
+            query['timestamp'] = {}
+            if before is not None:
+                query['timestamp']['$lt'] = before
+            if after is not None:
+                query['timestamp']['$gt'] = after
+        
+        # Walk forward from an `after` cursor, otherwise back from the newest
+        direction = 1 if after is not None else -1
         messages = chat_messages().find(
-            {'user_id': user_id}
-        ).sort('timestamp', -1).limit(limit)
+            query, {'role': 1, 'content': 1, 'timestamp': 1}
+        ).sort('timestamp', direction).limit(limit)
         
         result = []
         for msg in messages:
@@ -322,14 +684,27 @@ class ChatMessage:
                 if 'timestamp' in msg:
                     msg['timestamp'] = msg['timestamp'].isoformat()
                 result.append(msg)
+        if direction == 1:
+            result.reverse()
         return result
     
     @staticmethod
     def get_conversation_history(user_id: str, limit: int = 10) -> list:
-        """Get recent conversation history for context."""
+        """
+        Get recent conversation history for context, oldest first.
+        
+        Served from the in-process per-user buffer when it holds enough
+        messages; otherwise read from the log and used to fill the buffer.
+        """
+        if limit <= RECENT_MESSAGES_SIZE:
+            buffer = _recent_messages.get(user_id)
+            if buffer is not MISSING:
+                return list(buffer)[-limit:] if limit > 0 else []
+        
         messages = chat_messages().find(
-            {'user_id': user_id}
-        ).sort('timestamp', -1).limit(limit)
+            {'user_id': user_id},
+            {'role': 1, 'content': 1, 'timestamp': 1}
+        ).sort('timestamp', -1).limit(max(limit, RECENT_MESSAGES_SIZE))
         
         result = []
         for msg in reversed(list(messages)):
@@ -339,7 +714,9 @@ class ChatMessage:
                     'content': msg['content'],
                     'timestamp': msg['timestamp'].isoformat()
                 })
-        return result
+        
+        _recent_messages.set(user_id, deque(result[-RECENT_MESSAGES_SIZE:], maxlen=RECENT_MESSAGES_SIZE))
+        return result[-limit:] if limit > 0 else []
 
 
 def create_indexes():
@@ -351,10 +728,24 @@ def create_indexes():
         # Create indexes for daily_plans collection
         daily_plans().create_index([('user_id', 1), ('date', 1)], unique=True)
         
+        # Create indexes for open_tasks collection
+        open_tasks().create_index([('user_id', 1), ('plan_date', 1)])
+        
         # Create indexes for chat_messages collection
         chat_messages().create_index([('user_id', 1), ('timestamp', -1)])
         chat_messages().create_index('timestamp', expireAfterSeconds=60*60*24*30)  # Auto-expire after 30 days
         
+        # Expire persisted personality sessions after 30 days without activity
+        personality_sessions().create_index('updated_at', expireAfterSeconds=60*60*24*30)
+        
+        # Create indexes for profile_memories collection
+        profile_memories().create_index([('user_id', 1), ('importance', -1), ('created_at', -1)])
+        profile_memories().create_index([('user_id', 1), ('created_at', -1)])
+        profile_memories().create_index(
+            [('user_id', 1), ('content', 'text'), ('tags', 'text'), ('type', 'text')],
+            name='profile_memories_text'
+        )
+        
         current_app.logger.info("Database indexes created successfully")
     except Exception as e:
         current_app.logger.error(f"Error creating database indexes: {str(e)}")
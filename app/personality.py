@@ -2,11 +2,16 @@
 Personality module for the AI companion.
 Defines different personality aspects, tones, and behaviors with a focus on natural, human-like interaction.
 """
+from collections import OrderedDict
 from datetime import datetime, time, timedelta
 from typing import Dict, List, Optional, Tuple, Any
+import os
 import random
 import re
+import threading
 from enum import Enum, auto
+from .config import env_flag
+from .intents import MESSAGE_INTENTS, QUESTION_INTENTS, STATEMENT_INTENTS
 
 class ConversationTone(Enum):
     """Different tones the AI can use in conversation."""
@@ -25,6 +30,130 @@ class TimeOfDay(Enum):
     EVENING = (17, 21)   # 5pm - 9:59pm
     NIGHT = (22, 4)      # 10pm - 4:59am
 
+class PersonalitySession:
+    """Mutable conversation state for one user (history, context, last interaction)."""
+    
+    # Number of messages kept in a session's conversation history
+    MAX_HISTORY = 20
+    
+    def __init__(self, user_id: Optional[str], context: Dict = None,
+                 conversation_history: List[Dict] = None, last_interaction_time: datetime = None):
+        self.user_id = user_id
+        self.context = context or {
+            'last_topic': None,
+            'user_mood': None,
+            'last_interaction': None,
+            'user_preferences': {}
+        }
+        self.conversation_history = conversation_history or []
+        self.last_interaction_time = last_interaction_time or datetime.now()
+        self.lock = threading.Lock()
+    
+    def record(self, message: str, sender: str, is_user: bool = True) -> None:
+        """Append a message to the conversation history."""
+        with self.lock:
+            self.conversation_history.append({
+                'message': message,
+                'sender': 'user' if is_user else 'ai',
+                'name': sender,
+                'timestamp': datetime.now().isoformat()
+            })
+            
+            # Keep only the last messages to prevent memory issues
+            if len(self.conversation_history) > self.MAX_HISTORY:
+                self.conversation_history = self.conversation_history[-self.MAX_HISTORY:]
+            
+            self.last_interaction_time = datetime.now()
+    
+    def to_document(self) -> Dict:
+        """Serialize the session for MongoDB."""
+        with self.lock:
+            return {
+                '_id': self.user_id,
+                'context': self.context,
+                'conversation_history': list(self.conversation_history),
+                'last_interaction_time': self.last_interaction_time,
+                'updated_at': datetime.utcnow()
+            }
+    
+    @classmethod
+    def from_document(cls, doc: Dict) -> 'PersonalitySession':
+        """Rebuild a session saved with to_document."""
+        return cls(
+            doc['_id'],
+            context=doc.get('context'),
+            conversation_history=doc.get('conversation_history'),
+            last_interaction_time=doc.get('last_interaction_time')
+        )
+
+class PersonalitySessionStore:
+    """
+    Thread-safe, LRU-bounded store of per-user PersonalitySessions.
+    
+    Memory is bounded by the number of recently active users. When
+    persistence is enabled, sessions are saved to the personality_sessions
+    collection so they survive eviction and are shared between workers.
+    """
+    
+    def __init__(self, max_sessions: int = None, persist: bool = None):
+        if max_sessions is None:
+            max_sessions = int(os.getenv('PERSONALITY_MAX_SESSIONS', 10000))
+        if persist is None:
+            persist = env_flag('PERSONALITY_SESSION_PERSIST', False)
+        self.max_sessions = max_sessions
+        self.persist = persist
+        self._sessions = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id: str) -> PersonalitySession:
+        """Get the session for a user, loading or creating it if needed."""
+        with self._lock:
+            session = self._sessions.get(user_id)
+            if session is not None:
+                self._sessions.move_to_end(user_id)
+                return session
+        
+        # Load outside the lock so a slow read doesn't block other users
+        session = self._load(user_id) or PersonalitySession(user_id)
+        with self._lock:
+            # Another thread may have created the session meanwhile
+            session = self._sessions.setdefault(user_id, session)
+            self._sessions.move_to_end(user_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+        return session
+    
+    def save(self, session: PersonalitySession) -> None:
+        """Persist a session if persistence is enabled."""
+        if not self.persist or session.user_id is None:
+            return
+        try:
+            from .models import personality_sessions
+            doc = session.to_document()
+            personality_sessions().replace_one({'_id': doc['_id']}, doc, upsert=True)
+        except Exception as e:
+            print(f"Error saving personality session: {str(e)}")
+    
+    def discard(self, user_id: str) -> None:
+        """Drop a user's session from memory."""
+        with self._lock:
+            self._sessions.pop(user_id, None)
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._sessions)
+    
+    def _load(self, user_id: str) -> Optional[PersonalitySession]:
+        if not self.persist:
+            return None
+        try:
+            from .models import personality_sessions
+            doc = personality_sessions().find_one({'_id': user_id})
+            return PersonalitySession.from_document(doc) if doc else None
+        except Exception as e:
+            print(f"Error loading personality session: {str(e)}")
+            return None
+
 class PersonalityTraits:
     """
     Defines the core personality traits and conversational style of the AI companion.
@@ -46,14 +175,8 @@ class PersonalityTraits:
             'passion': 7           # Enthusiastic and engaged
         }
         
-        # Current conversation context
-        self.context = {
-            'last_topic': None,
-            'user_mood': None,
-            'last_interaction': None,
-            'conversation_history': [],
-            'user_preferences': {}
-        }
+        # Per-user conversation state (history, context, last interaction)
+        self.sessions = PersonalitySessionStore()
         
         # Different interaction styles with weights for random selection
         self.styles = {
@@ -133,10 +256,7 @@ class PersonalityTraits:
             "The fact that you're trying says a lot about you. Keep at it! 😊",
             "You're stronger than you think. I believe in you! ✨"
         ]
-        
-        # Conversation memory tracking
-        self.conversation_history = []
-        self.last_interaction_time = datetime.now()
+
     
     def get_time_based_greeting(self, user_name: str = None) -> str:
         """
@@ -396,7 +516,8 @@ class PersonalityTraits:
         
         return styled_message
     
-    def get_response(self, message: str, user_name: str = None, context: Dict = None) -> str:
+    def get_response(self, message: str, user_name: str = None, context: Dict = None,
+                     user_id: str = None) -> str:
         """
         Generate a natural-sounding response to the user's message.
         
@@ -404,12 +525,16 @@ class PersonalityTraits:
             message: The user's message
             user_name: Optional name for personalization
             context: Optional context about the conversation
+            user_id: User whose session holds the conversation state; without
+                one, the exchange is not remembered
             
         Returns:
             str: A natural-sounding response
         """
+        session = self.sessions.get(user_id) if user_id else PersonalitySession(None)
+        
         # Update conversation history (for context, not shown to user)
-        self._update_conversation_history(message, user_name, is_user=True)
+        session.record(message, user_name, is_user=True)
         
         # Clean and normalize the message
         message = message.lower().strip()
@@ -421,13 +546,14 @@ class PersonalityTraits:
         chosen_style = random.choices(style_names, weights=weights, k=1)[0]
         
         # Generate a base response based on message content
+        intent = MESSAGE_INTENTS.match(message)
         if not message or message in ['hi', 'hello', 'hey']:
             response = self.get_time_based_greeting(user_name)
-        elif '?' in message:
+        elif intent == 'question':
             response = self._generate_question_response(message, user_name)
-        elif any(word in message for word in ['work', 'task', 'todo', 'do today']):
+        elif intent == 'work':
             response = self._handle_work_related(message, user_name)
-        elif any(word in message for word in ['meet', 'see', 'hang out', 'get together']):
+        elif intent == 'meet':
             response = self._handle_meet_someone(message, user_name)
         else:
             response = self._generate_statement_response(message, user_name)
@@ -447,7 +573,8 @@ class PersonalityTraits:
             styled_response += random.choice(follow_ups)
         
         # Update conversation history with AI response
-        self._update_conversation_history(styled_response, "AI", is_user=False)
+        session.record(styled_response, "AI", is_user=False)
+        self.sessions.save(session)
         
         return styled_response
         
@@ -477,21 +604,21 @@ class PersonalityTraits:
         name = user_name or ''
         
         # Categorize question type based on keywords
-        question = question.lower()
+        intent = QUESTION_INTENTS.match(question)
         
-        if any(word in question for word in ['how are you', 'how do you do', "how's it going"]):
+        if intent == 'how_are_you':
             responses = [
                 "I'm doing well, thanks for asking! How about you?",
                 "I'm great! Just here to help you out. What's new with you?",
                 "Doing good! What's on your mind today?"
             ]
-        elif any(word in question for word in ['what', 'when', 'where', 'why', 'how', 'who', 'which']):
+        elif intent == 'open':
             responses = [
                 "That's an interesting question. What's making you ask?",
                 "I'd love to help with that. Could you tell me more about what you're thinking?",
                 "Hmm, that makes me curious too. What are your thoughts on it?"
             ]
-        elif any(word in question for word in ['can you', 'could you', 'would you']):
+        elif intent == 'request':
             responses = [
                 "I'll do my best to help with that. What specifically do you need?",
                 "I can certainly try! Tell me more about what you're looking for.",
@@ -509,22 +636,22 @@ class PersonalityTraits:
     def _generate_statement_response(self, statement: str, user_name: str = None) -> str:
         """Generate a natural response to a statement."""
         name = user_name or ''
-        statement = statement.lower()
+        intent = STATEMENT_INTENTS.match(statement)
         
         # Check for different types of statements
-        if any(word in statement for word in ['i feel', "i'm feeling", 'i am feeling']):
+        if intent == 'feeling':
             responses = [
                 f"I hear you, {name}. What's been on your mind?" if name else "I hear you. What's been on your mind?",
                 "That's completely valid. Want to talk more about it?",
                 "I understand. Sometimes putting feelings into words helps. What else is going on?"
             ]
-        elif any(word in statement for word in ['i need', 'i want', 'i would like']):
+        elif intent == 'need':
             responses = [
                 "I'm listening. Tell me more about what you're looking for.",
                 "I hear you. What would be most helpful right now?",
                 "I understand. What's the best way I can support you with that?"
             ]
-        elif any(word in statement for word in ['i think', 'i believe', 'in my opinion']):
+        elif intent == 'opinion':
             responses = [
                 "That's an interesting perspective. What led you to that thought?",
                 "I see where you're coming from. What else do you think about that?",
@@ -541,21 +668,6 @@ class PersonalityTraits:
             
         return random.choice(responses)
     
-    def _update_conversation_history(self, message: str, sender: str, is_user: bool = True) -> None:
-        """Update the conversation history."""
-        self.conversation_history.append({
-            'message': message,
-            'sender': 'user' if is_user else 'ai',
-            'name': sender,
-            'timestamp': datetime.now().isoformat()
-        })
-        
-        # Keep only the last 20 messages to prevent memory issues
-        if len(self.conversation_history) > 20:
-            self.conversation_history = self.conversation_history[-20:]
-        
-        self.last_interaction_time = datetime.now()
-    
     def check_urgent_tasks(self, tasks: List[Dict]) -> Optional[str]:
         """Check for urgent or overdue tasks."""
         now = datetime.now()
@@ -47,7 +47,7 @@ def profile():
                 error = 'Session expired. Please refresh the page and try again.'
             else:
                 # Check if profile exists and update or create
-                existing_profile = UserProfile.get_by_user_id(user_id)
+                existing_profile = UserProfile.get_summary(user_id)
         
                 if existing_profile:
                     # Update existing profile
@@ -63,12 +63,16 @@ def profile():
                 if success:
                     # Save to vector memory
                     memory_text = " ".join([f"Q: {PROFILE_QUESTIONS[int(k[1:])-1]} A: {v}" for k, v in answers.items()])
-                    memory_system.save_memory(
-                        user_id=user_id,
-                        text=memory_text,
-                        tags=['profile'],
-                        metadata={'type': 'profile'}
-                    )
+                    try:
+                        memory_system.save_memory(
+                            user_id=user_id,
+                            text=memory_text,
+                            tags=['profile'],
+                            metadata={'type': 'profile'}
+                        )
+                    except Exception as e:
+                        current_app.logger.error(f"Error saving profile to memory: {str(e)}")
+                        # Continue even if memory save fails
                     
                     if request.headers.get('X-Requested-With') == 'XMLHttpRequest':
                         return jsonify({'message': message})
@@ -104,7 +108,7 @@ def get_profile():
     if not user_id:
         return jsonify({'error': 'Not authenticated'}), 401
     
-    profile = UserProfile.get_by_user_id(user_id)
+    profile = UserProfile.get_summary(user_id)
     
     if not profile or 'answers' not in profile:
         return jsonify({'error': 'Profile not found'}), 404
@@ -0,0 +1,141 @@
+"""
+Rate Limit Module
+
+Cluster-wide token buckets for upstream (Gemini) calls. Bucket state lives in
+a MongoDB document that every worker process updates atomically, with
+MongoDB's own clock used for refills, so the limit holds across all workers
+however many are running. Interactive calls may use the whole bucket;
+background calls must leave a reserve for them. A call that can't get a
+token within its priority's wait budget is shed with RateLimitedError so the
+caller can fall back instead of hitting a 429.
+"""
+import os
+import threading
+import time
+from typing import Any, Dict
+from pymongo import ReturnDocument
+
+# Seconds an interactive call may queue for a token before being shed
+QUEUE_WAIT = float(os.getenv('GEMINI_QUEUE_WAIT', 1.0))
+
+# Share of the bucket background calls must leave for interactive ones, and
+# how long each priority may queue for a token
+PRIORITIES = {
+    'interactive': {'reserve': 0.0, 'max_wait': QUEUE_WAIT},
+    'background': {'reserve': 0.5, 'max_wait': QUEUE_WAIT * 5}
+}
+
+
+class RateLimitedError(Exception):
+    """Raised when a call is shed because no token became available in time."""
+
+
+def rate_limits():
+    """Get the rate_limits collection."""
+    from .models import get_collection
+    return get_collection('rate_limits')
+
+
+class TokenBucket:
+    """A token bucket shared by all workers through one MongoDB document."""
+
+    def __init__(self, name: str, per_minute: float):
+        """
+        Initialize the bucket.
+
+        Args:
+            name: Bucket name (the _id of its MongoDB document)
+            per_minute: Sustained calls per minute; 0 disables the limit
+        """
+        self.name = name
+        self.rate = per_minute / 60.0
+        # Allow bursts of up to a quarter of a minute's budget
+        self.capacity = max(1.0, per_minute / 4.0)
+        self._lock = threading.Lock()
+        self.stats = {
+            'granted': 0,
+            'queued': 0,
+            'shed': 0,
+            'errors': 0
+        }
+
+    def _take(self, cost: float, reserve: float) -> Dict[str, Any]:
+        """Refill by elapsed time and take `cost` tokens if `reserve` would remain."""
+        return rate_limits().find_one_and_update(
+            {'_id': self.name},
+            [
+                {'$set': {
+                    'tokens': {'$min': [
+                        self.capacity,
+                        {'$add': [
+                            {'$ifNull': ['$tokens', self.capacity]},
+                            {'$multiply': [
+                                {'$divide': [
+                                    {'$subtract': ['$$NOW', {'$ifNull': ['$updated_at', '$$NOW']}]},
+                                    1000
+                                ]},
+                                self.rate
+                            ]}
+                        ]}
+                    ]},
+                    'updated_at': '$$NOW'
+                }},
+                {'$set': {'granted': {'$gte': ['$tokens', cost + reserve]}}},
+                {'$set': {'tokens': {'$cond': ['$granted', {'$subtract': ['$tokens', cost]}, '$tokens']}}}
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+
+    def acquire(self, priority: str = 'interactive', cost: float = 1.0) -> None:
+        """
+        Take a token, queueing briefly if the bucket is empty.
+
+        Args:
+            priority: A key of PRIORITIES
+            cost: Tokens this call consumes
+
+        Raises:
+            RateLimitedError: If no token is available within the priority's wait budget
+        """
+        if self.rate <= 0:
+            return
+        policy = PRIORITIES[priority]
+        reserve = min(policy['reserve'] * self.capacity, self.capacity - cost)
+        deadline = time.monotonic() + policy['max_wait']
+        waited = False
+
+        while True:
+            try:
+                doc = self._take(cost, reserve)
+            except Exception as e:
+                # Fail open: a limiter outage shouldn't take chat down with it
+                print(f"Error checking rate limit {self.name}: {str(e)}")
+                self._count('errors')
+                return
+
+            if doc.get('granted'):
+                self._count('granted')
+                if waited:
+                    self._count('queued')
+                return
+
+            # Sleep until enough tokens should have refilled, if that's in budget
+            wait = (cost + reserve - doc.get('tokens', 0)) / self.rate
+            if time.monotonic() + wait > deadline:
+                self._count('shed')
+                raise RateLimitedError(f"Gemini {self.name} rate limit reached ({priority})")
+            waited = True
+            time.sleep(wait)
+
+    def _count(self, key: str) -> None:
+        with self._lock:
+            self.stats[key] += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return this process's counters and the configured limits."""
+        with self._lock:
+            stats = dict(self.stats)
+        stats['per_minute'] = self.rate * 60
+        stats['capacity'] = self.capacity
+        return stats
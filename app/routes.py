@@ -1,10 +1,13 @@
-from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app
+from flask import Blueprint, render_template, request, jsonify, session, redirect, url_for, current_app, Response, stream_with_context
 from bson import ObjectId
 from datetime import datetime
 import json
 
 from .models import UserProfile, DailyPlan, ChatMessage
-from .suggestion_engine import generate_response
+from .suggestion_engine import generate_response, generate_response_stream, StreamInterruptedError
+from .health import health_monitor
+from . import gemini
+from .memory_system import memory_system
 
 bp = Blueprint('chat', __name__)
 
@@ -16,7 +19,7 @@ def index():
     
     # Check if user has completed profile
     user_id = session['user_id']
-    has_profile = UserProfile.get_by_user_id(user_id) is not None
+    has_profile = UserProfile.get_summary(user_id) is not None
     
     if not has_profile:
         return redirect(url_for('profile.profile'))
@@ -37,7 +40,7 @@ def chat():
         return redirect(url_for('profile.profile'))
     
     user_id = session['user_id']
-    user_profile = UserProfile.get_by_user_id(user_id)
+    user_profile = UserProfile.get_summary(user_id)
     
     if not user_profile:
         return redirect(url_for('profile.profile'))
@@ -47,7 +50,7 @@ def chat():
     if user_profile and 'answers' in user_profile:
         username = user_profile['answers'].get('name', 'Friend')
     
-    return render_template('chat.html', username=username)
+    return render_template('chat.html', username=username, user_id=user_id)
 
 @bp.route('/api/chat', methods=['POST'])
 def chat_api():
@@ -63,21 +66,17 @@ def chat_api():
         return jsonify({'error': 'Message cannot be empty'}), 400
     
     try:
-        # Save user message using ChatMessage model
-        ChatMessage.create(
-            user_id=user_id,
-            role='user',
-            content=message
-        )
+        received_at = datetime.utcnow()
         
         # Generate AI response
         response = generate_response(user_id, message)
         
-        # Save AI response using ChatMessage model
-        ChatMessage.create(
+        # Save the user message and the AI response together
+        ChatMessage.create_turn(
             user_id=user_id,
-            role='assistant',
-            content=response
+            user_content=message,
+            assistant_content=response,
+            user_timestamp=received_at
         )
         
         return jsonify({
@@ -89,73 +88,139 @@ def chat_api():
         current_app.logger.error(f'Error in chat_api: {str(e)}')
         return jsonify({'error': 'An error occurred'}), 500
 
+def _sse(data: dict, event: str = None) -> str:
+    """Format one Server-Sent Event."""
+    lines = f"event: {event}\n" if event else ""
+    return f"{lines}data: {json.dumps(data)}\n\n"
+
+@bp.route('/api/chat/stream', methods=['POST'])
+def chat_stream():
+    """Handle chat messages, streaming the reply as Server-Sent Events."""
+    if 'user_id' not in session:
+        return jsonify({'error': 'Not authenticated'}), 401
+    
+    data = request.get_json()
+    user_id = session['user_id']
+    message = data.get('message', '').strip()
+    
+    if not message:
+        return jsonify({'error': 'Message cannot be empty'}), 400
+    
+    received_at = datetime.utcnow()
+    
+    def events():
+        parts = []
+        saved = False
+        try:
+            for chunk in generate_response_stream(user_id, message):
+                parts.append(chunk)
+                yield _sse({'delta': chunk})
+            
+            # Persist the whole turn once the stream is complete
+            response = ''.join(parts).strip()
+            ChatMessage.create_turn(
+                user_id=user_id,
+                user_content=message,
+                assistant_content=response,
+                user_timestamp=received_at
+            )
+            saved = True
+            yield _sse({'response': response, 'timestamp': datetime.utcnow().isoformat()}, event='done')
+        except StreamInterruptedError as e:
+            # Don't save a cut-off reply as if it were complete
+            current_app.logger.warning(f'Reply stream interrupted for {user_id}: {str(e)}')
+            yield _sse({'error': 'The reply was interrupted'}, event='error')
+        except Exception as e:
+            current_app.logger.error(f'Error in chat_stream: {str(e)}')
+            yield _sse({'error': 'An error occurred'}, event='error')
+        finally:
+            # Keep the user's message even if the reply never completed
+            if not saved:
+                try:
+                    ChatMessage.create(user_id=user_id, role='user', content=message, timestamp=received_at)
+                except Exception as e:
+                    current_app.logger.error(f'Error saving chat message: {str(e)}')
+    
+    return Response(
+        stream_with_context(events()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 @bp.route('/api/chat/history')
 def chat_history():
-    """Get chat history for the current user."""
+    """
+    Get chat history for the current user, newest first.
+    
+    Supports `before` and `after` ISO timestamp cursors and answers with
+    304 Not Modified when the client's ETag still matches.
+    """
     if 'user_id' not in session:
         return jsonify({'error': 'Not authenticated'}), 401
     
     try:
         user_id = session['user_id']
         limit = min(int(request.args.get('limit', 50)), 100)  # Max 100 messages
+        before = request.args.get('before')
+        after = request.args.get('after')
+        before = datetime.fromisoformat(before) if before else None
+        after = datetime.fromisoformat(after) if after else None
+    except ValueError:
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+    
+    try:
+        # Fetch one extra message to tell whether another page exists
+        messages = ChatMessage.get_user_messages(user_id, limit + 1, before=before, after=after)
+        has_more = len(messages) > limit
+        if has_more:
+            # Drop the extra message furthest from the cursor
+            messages = messages[1:] if after else messages[:limit]
         
-        # Get messages using ChatMessage model
-        messages = ChatMessage.get_user_messages(user_id, limit)
-        
-        return jsonify({'messages': messages})
+        response = jsonify({'messages': messages, 'has_more': has_more})
+        response.headers['Cache-Control'] = 'private, no-cache'
+        response.add_etag()
+        return response.make_conditional(request)
         
     except Exception as e:
         current_app.logger.error(f'Error fetching chat history: {str(e)}')
         return jsonify({'error': 'Failed to fetch chat history'}), 500
 
+@bp.route('/api/health', methods=['GET'])
+def health():
+    """Liveness probe: no upstream or database calls."""
+    return jsonify({'status': 'ok'})
+
 @bp.route('/api/status', methods=['GET'])
 def status():
     """Check the status of the application and user session."""
-    import google.generativeai as genai
+    # Upstream health comes from the background monitor's cached probe
+    upstream = health_monitor.get_status()
     
     status = {
         'authenticated': 'user_id' in session,
         'has_profile': False,
         'has_today_plan': False,
         'status': 'ok',
-        'api_status': {
-            'gemini': 'unknown',
-            'embeddings': 'unknown'
-        }
+        'api_status': upstream['api_status'],
+        'checked_at': upstream['checked_at'],
+        'refresh_interval': upstream['refresh_interval'],
+        'cache': {
+            'profiles': UserProfile.cache_stats()
+        },
+        'circuits': gemini.circuit_stats(),
+        'rate_limits': gemini.rate_limit_stats()
     }
     
-    # Test API availability
-    try:
-        # Try a simple embedding request
-        genai.embed_content(
-            model='models/embedding-001',
-            content=['test'],
-            task_type="retrieval_document"
-        )
-        status['api_status']['embeddings'] = 'working'
-    except Exception as e:
-        if '429' in str(e) or 'quota' in str(e).lower():
-            status['api_status']['embeddings'] = 'quota_exceeded'
-        else:
-            status['api_status']['embeddings'] = 'error'
-    
-    try:
-        # Try a simple generation request
-        model = genai.GenerativeModel('gemini-1.5-flash')
-        model.generate_content('test', generation_config={'max_output_tokens': 1})
-        status['api_status']['gemini'] = 'working'
-    except Exception as e:
-        if '429' in str(e) or 'quota' in str(e).lower():
-            status['api_status']['gemini'] = 'quota_exceeded'
-        else:
-            status['api_status']['gemini'] = 'error'
+    # Only report embedding cache stats once the memory system exists
+    if memory_system.initialized:
+        status['cache']['embeddings'] = memory_system.embedding_cache.get_stats()
     
     if 'user_id' in session:
         user_id = session['user_id']
         status['user_id'] = user_id
         
         # Check if user has a profile
-        profile = UserProfile.get_by_user_id(user_id)
+        profile = UserProfile.get_summary(user_id)
         status['has_profile'] = profile is not None
         
         # Check if user has a plan for today
@@ -1,18 +1,41 @@
 import os
 import json
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeout
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
-import google.generativeai as genai
+from typing import List, Dict, Any, Optional, Tuple, Iterator
+import pymongo
 from flask import current_app
 from .models import ChatMessage, UserProfile, DailyPlan
 from .memory_system import memory_system, save_memory, query_memory
 from .personality import personality
+from .intents import FALLBACK_INTENTS
+from . import gemini
 import random
 
 # Configuration
 MEMORY_WINDOW_DAYS = 30  # How many days of chat history to consider for context
 MAX_MEMORY_ITEMS = 10    # Maximum number of memory items to include in context
 MAX_CONVERSATION_HISTORY = 5  # Number of recent messages to include in context
+OVERDUE_TASKS_SHOWN = 3  # Overdue tasks listed in a proactive nudge
+
+# Seconds each context source may take before its section is left empty
+CONTEXT_SOURCE_TIMEOUTS = {
+    'profile_info': float(os.getenv('CONTEXT_DB_TIMEOUT', 1.0)),
+    'memories': float(os.getenv('CONTEXT_DB_TIMEOUT', 1.0)),
+    'daily_plan': float(os.getenv('CONTEXT_DB_TIMEOUT', 1.0)),
+    'chat_history': float(os.getenv('CONTEXT_DB_TIMEOUT', 1.0)),
+    'overdue_tasks': float(os.getenv('CONTEXT_DB_TIMEOUT', 1.0))
+}
+
+class StreamInterruptedError(Exception):
+    """Raised by generate_response_stream when Gemini fails after text was yielded."""
+
+# Shared pool for fetching context sources concurrently
+_context_pool = ThreadPoolExecutor(
+    max_workers=int(os.getenv('CONTEXT_POOL_WORKERS', 16)),
+    thread_name_prefix='context'
+)
 
 # System prompt template with enhanced personality and proactiveness
 SYSTEM_PROMPT = """You are Lumi, a close friend and life coach rolled into one. Your mission is to help the user build their best life through meaningful support and accountability.
@@ -55,9 +78,6 @@ SYSTEM_PROMPT = """You are Lumi, a close friend and life coach rolled into one.
 - If they're struggling, help them break things down
 - Always bring the conversation back to their goals and wellbeing"""
 
-# Initialize the model
-model = genai.GenerativeModel('gemini-1.5-flash')
-
 # Configure generation settings
 GENERATION_CONFIG = {
     'temperature': 0.7,
@@ -73,10 +93,96 @@ SAFETY_SETTINGS = [
     {"category": "HARM_CATEGORY_DANGEROUS_CONTENT", "threshold": "BLOCK_NONE"},
 ]
 
+def _run_in_app_context(app, deadline: float, func, *args):
+    """
+    Run func inside the given app's context (for pool threads).
+    
+    MongoDB operations in func time out at the deadline, so a hung query
+    can't hold a pool worker after its result has been given up on.
+    """
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        # Queued past the deadline; the caller has already given up
+        raise FutureTimeout()
+    with app.app_context(), pymongo.timeout(remaining):
+        return func(*args)
+
+def _submit(deadline: float, func, *args) -> Future:
+    """Run func on the shared context pool with the current app context, bounded by deadline."""
+    app = current_app._get_current_object()
+    return _context_pool.submit(_run_in_app_context, app, deadline, func, *args)
+
+def _result_or_default(name: str, future: Future, deadline: float, default):
+    """Wait for a context source until its deadline, degrading to default on timeout or error."""
+    try:
+        return future.result(timeout=max(0.0, deadline - time.monotonic()))
+    except FutureTimeout:
+        # Free the pool slot if the job hasn't started yet
+        future.cancel()
+        current_app.logger.warning(f"Context source '{name}' timed out")
+    except Exception as e:
+        current_app.logger.error(f"Error getting {name}: {str(e)}")
+    return default
+
+def _profile_section(user_id: str) -> str:
+    """Format the user's personal info for the prompt."""
+    profile = UserProfile.get_summary(user_id)
+    if not profile:
+        return ''
+    personal_info = profile.get('personal_info', {})
+    if not personal_info:
+        return ''
+    return (
+        f"Name: {personal_info.get('name', 'Friend')}\n"
+        f"Location: {personal_info.get('location', 'Not specified')}\n"
+        f"Occupation: {personal_info.get('occupation', 'Not specified')}\n"
+        f"Interests: {', '.join(personal_info.get('interests', [])) or 'None specified'}\n"
+        f"Goals: {', '.join(personal_info.get('goals', [])) or 'None specified'}"
+    )
+
+def _memories_section(user_id: str) -> str:
+    """Format the user's most relevant profile memories for the prompt."""
+    memories = UserProfile.get_relevant_memories(user_id, limit=3)
+    if not memories:
+        return ''
+    memory_texts = []
+    for mem in memories:
+        memory_texts.append(f"- {mem.get('content', '')} ({mem.get('type', 'note')})")
+    return "\n".join(memory_texts)
+
+def _daily_plan_section(user_id: str) -> str:
+    """Format today's plan for the prompt."""
+    today = datetime.utcnow().date().isoformat()
+    plan = DailyPlan.get_today_plan(user_id, today)
+    if not plan:
+        return ''
+    tasks = "\n".join([f"- {task}" for task in plan.get('tasks', [])])
+    return (
+        f"Mood: {plan.get('mood', 'Not specified')}\n"
+        f"Tasks:\n{tasks or 'No tasks for today'}"
+    )
+
+def _chat_history_section(user_id: str, recent_messages: List[Dict] = None) -> str:
+    """Format the recent conversation for the prompt, oldest message first."""
+    if not recent_messages:
+        recent_messages = ChatMessage.get_conversation_history(user_id, MAX_CONVERSATION_HISTORY)
+    
+    chat_history = []
+    for msg in recent_messages[-MAX_CONVERSATION_HISTORY:]:
+        role = msg.get('role', 'user')
+        content = msg.get('content', '').strip()
+        if content:
+            chat_history.append(f"{role.upper()}: {content}")
+    return "\n".join(chat_history)
+
 def get_context(user_id: str, recent_messages: List[Dict] = None) -> Dict[str, str]:
     """
     Retrieve relevant context for the AI to generate a response.
     
+    The profile, memories, daily plan and chat history are fetched in parallel
+    on a shared thread pool. A source that fails or misses its timeout leaves
+    its section empty instead of holding up the response.
+    
     Args:
         user_id: The user's unique identifier
         recent_messages: List of recent chat messages (optional)
@@ -84,79 +190,51 @@ def get_context(user_id: str, recent_messages: List[Dict] = None) -> Dict[str, s
     Returns:
         Dict containing different context components
     """
-    context = {
-        'profile_info': '',
-        'daily_plan': '',
-        'memories': '',
-        'chat_history': ''
+    start = time.monotonic()
+    deadlines = {name: start + CONTEXT_SOURCE_TIMEOUTS[name]
+                 for name in ('profile_info', 'memories', 'daily_plan', 'chat_history')}
+    futures = {
+        'profile_info': _submit(deadlines['profile_info'], _profile_section, user_id),
+        'memories': _submit(deadlines['memories'], _memories_section, user_id),
+        'daily_plan': _submit(deadlines['daily_plan'], _daily_plan_section, user_id),
+        'chat_history': _submit(deadlines['chat_history'], _chat_history_section, user_id, recent_messages)
     }
     
-    try:
-        # Get user profile
-        profile = UserProfile.get_by_user_id(user_id)
-        if profile:
-            personal_info = profile.get('personal_info', {})
-            if personal_info:
-                context['profile_info'] = (
-                    f"Name: {personal_info.get('name', 'Friend')}\n"
-                    f"Location: {personal_info.get('location', 'Not specified')}\n"
-                    f"Occupation: {personal_info.get('occupation', 'Not specified')}\n"
-                    f"Interests: {', '.join(personal_info.get('interests', [])) or 'None specified'}\n"
-                    f"Goals: {', '.join(personal_info.get('goals', [])) or 'None specified'}"
-                )
-            
-            # Get relevant memories
-            memories = UserProfile.get_relevant_memories(user_id, limit=3)
-            if memories:
-                memory_texts = []
-                for mem in memories:
-                    memory_texts.append(f"- {mem.get('content', '')} ({mem.get('type', 'note')})")
-                context['memories'] = "\n".join(memory_texts)
-    
-    except Exception as e:
-        current_app.logger.error(f"Error getting user context: {str(e)}")
-    
-    # Get today's plan
-    try:
-        today = datetime.utcnow().date().isoformat()
-        plan = DailyPlan.get_today_plan(user_id, today)
-        if plan:
-            tasks = "\n".join([f"- {task}" for task in plan.get('tasks', [])])
-            context['daily_plan'] = (
-                f"Mood: {plan.get('mood', 'Not specified')}\n"
-                f"Tasks:\n{tasks or 'No tasks for today'}"
-            )
-    except Exception as e:
-        current_app.logger.error(f"Error getting daily plan: {str(e)}")
-    
-    # Get recent chat history
-    try:
-        if not recent_messages:
-            recent_messages = memory_system.query_memory(
-                user_id=user_id,
-                query="recent conversation",
-                k=MAX_CONVERSATION_HISTORY,
-                tags=['chat']
-            )
-        
-        if recent_messages:
-            chat_history = []
-            for msg in reversed(recent_messages[-MAX_CONVERSATION_HISTORY:]):
-                role = msg.get('metadata', {}).get('role', 'user')
-                content = msg.get('text', '').strip()
-                if content:
-                    chat_history.append(f"{role.upper()}: {content}")
-            
-            if chat_history:
-                context['chat_history'] = "\n".join(chat_history)
-    except Exception as e:
-        current_app.logger.error(f"Error getting chat history: {str(e)}")
+    context = {}
+    for name, future in futures.items():
+        context[name] = _result_or_default(name, future, deadlines[name], '')
     
     # Add current time to context
     context['current_time'] = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S UTC')
     
     return context
 
+def _prepare_response(user_id: str, message: str, chat_history: List[Dict] = None) -> Tuple[Dict, Optional[str]]:
+    """
+    Gather the prompt context and any proactive message for a reply.
+    
+    Returns:
+        Tuple of (context, proactive response to send instead of a reply, or None)
+    """
+    # A proactive message only replaces replies to (near-)empty messages
+    wants_proactive = not message.strip() or len(message.strip()) < 3
+    
+    # Look up overdue tasks while the context is being assembled. Only this
+    # read runs on the pool: claiming a check-in writes to the profile, so it
+    # happens below, on this thread, once its greeting can't be discarded.
+    overdue_deadline = time.monotonic() + CONTEXT_SOURCE_TIMEOUTS['overdue_tasks']
+    overdue_future = _submit(overdue_deadline, get_overdue_tasks, user_id) if wants_proactive else None
+    
+    # Get relevant context
+    context = get_context(user_id, chat_history)
+    
+    if not wants_proactive:
+        return context, None
+    
+    # Check if we should initiate a proactive conversation
+    overdue = _result_or_default('overdue_tasks', overdue_future, overdue_deadline, (0, []))
+    return context, check_proactive_engagement(user_id, context, overdue)
+
 def generate_response(user_id: str, message: str, chat_history: List[Dict] = None) -> str:
     """
     Generate a personalized response to the user's message with fallback mechanisms.
@@ -170,12 +248,8 @@ def generate_response(user_id: str, message: str, chat_history: List[Dict] = Non
         str: Generated response from the AI
     """
     try:
-        # Get relevant context
-        context = get_context(user_id, chat_history)
-        
-        # Check if we should initiate a proactive conversation
-        proactive_response = check_proactive_engagement(user_id, context)
-        if proactive_response and (not message.strip() or len(message.strip()) < 3):
+        context, proactive_response = _prepare_response(user_id, message, chat_history)
+        if proactive_response:
             return proactive_response
             
         # Try to use Gemini API first
@@ -193,8 +267,63 @@ def generate_response(user_id: str, message: str, chat_history: List[Dict] = Non
         current_app.logger.error(f"Error generating response: {str(e)}")
         return "I'm having trouble thinking of a response right now. Could you try asking me something else?"
 
-def _generate_gemini_response(user_id: str, message: str, context: Dict, chat_history: List[Dict] = None) -> str:
-    """Generate response using Gemini API."""
+def generate_response_stream(user_id: str, message: str, chat_history: List[Dict] = None) -> Iterator[str]:
+    """
+    Generate a response like generate_response, yielding text as Gemini produces it.
+    
+    If Gemini fails before producing any text, the fallback response is
+    yielded as a single chunk instead.
+    
+    Raises:
+        StreamInterruptedError: If Gemini fails after part of the reply was
+            yielded, so callers don't mistake the partial text for a whole reply
+    
+    Args:
+        user_id: The user's unique identifier
+        message: The user's message
+        chat_history: List of previous messages in the conversation
+        
+    Yields:
+        str: Consecutive pieces of the response text
+    """
+    try:
+        context, proactive_response = _prepare_response(user_id, message, chat_history)
+        if proactive_response:
+            yield proactive_response
+            return
+        
+        # Try to stream from Gemini first
+        produced = False
+        try:
+            stream = gemini.generate_content(
+                _build_conversation(message, context, chat_history),
+                generation_config=GENERATION_CONFIG,
+                safety_settings=SAFETY_SETTINGS,
+                stream=True
+            )
+            for chunk in stream:
+                text = _extract_text(chunk)
+                if text:
+                    produced = True
+                    yield text
+        except Exception as api_error:
+            if produced:
+                current_app.logger.warning(f"Gemini stream interrupted: {str(api_error)}")
+                raise StreamInterruptedError(str(api_error)) from api_error
+            current_app.logger.warning(f"Gemini API failed, using fallback: {str(api_error)}")
+        
+        if not produced:
+            # Fallback to personality-based responses
+            yield _generate_fallback_response(user_id, message, context)
+        
+    except StreamInterruptedError:
+        raise
+    except Exception as e:
+        current_app.logger.error(f"Error generating response: {str(e)}")
+        yield "I'm having trouble thinking of a response right now. Could you try asking me something else?"
+
+def _build_conversation(message: str, context: Dict, chat_history: List[Dict] = None) -> List[Dict]:
+    """Build the Gemini conversation from the system prompt, history and message."""
     # Format the system prompt with context
     system_prompt = SYSTEM_PROMPT.format(
         profile_info=context.get('profile_info', 'No profile information available.'),
@@ -217,38 +346,51 @@ def _generate_gemini_response(user_id: str, message: str, context: Dict, chat_hi
     
     # Add the current user message
     conversation.append({"role": "user", "parts": [message]})
+    return conversation
+
+def _extract_text(response) -> str:
+    """Extract the text from a Gemini response or streamed chunk."""
+    try:
+        if response and hasattr(response, 'text'):
+            return response.text
+    except ValueError:
+        # .text raises when a chunk has no text parts (e.g. blocked by safety)
+        pass
     
+    response_text = ""
+    if response and hasattr(response, 'candidates'):
+        # Handle response format for some Gemini models
+        for candidate in response.candidates:
+            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
+                response_text = ' '.join(part.text for part in candidate.content.parts if hasattr(part, 'text'))
+    return response_text
+
+def _generate_gemini_response(user_id: str, message: str, context: Dict, chat_history: List[Dict] = None) -> str:
+    """Generate response using Gemini API."""
     # Generate response
-    response = model.generate_content(
-        conversation,
+    response = gemini.generate_content(
+        _build_conversation(message, context, chat_history),
         generation_config=GENERATION_CONFIG,
         safety_settings=SAFETY_SETTINGS
     )
     
     # Extract and clean the response text
-    response_text = ""
-    if response and hasattr(response, 'text'):
-        response_text = response.text.strip()
-    elif response and hasattr(response, 'candidates'):
-        # Handle response format for some Gemini models
-        for candidate in response.candidates:
-            if hasattr(candidate, 'content') and hasattr(candidate.content, 'parts'):
-                response_text = ' '.join(part.text for part in candidate.content.parts if hasattr(part, 'text')).strip()
-    
-    return response_text
+    return _extract_text(response).strip()
 
 def _generate_fallback_response(user_id: str, message: str, context: Dict) -> str:
     """Generate fallback response using personality system when API fails."""
     from .personality import personality
     
     # Get user profile for personalization
-    profile = UserProfile.get_by_user_id(user_id)
+    profile = UserProfile.get_summary(user_id)
     username = 'Friend'
     if profile and 'personal_info' in profile:
         username = profile['personal_info'].get('name', 'Friend')
     
+    intent = FALLBACK_INTENTS.match(message)
+    
     # Check if the user shared personal information
-    if any(phrase in message.lower() for phrase in ['my name is', "i'm ", "i am ", "i'm from", "i live in"]):
+    if intent == 'personal_info':
         try:
             UserProfile.add_memory(
                 user_id=user_id,
@@ -265,19 +407,19 @@ def _generate_fallback_response(user_id: str, message: str, context: Dict) -> st
         )
     
     # Generate contextual response based on message content
-    if any(word in message.lower() for word in ['task', 'todo', 'work', 'busy']):
+    if intent == 'tasks':
         return personality.get_style('motivational', 
             f"I understand you're dealing with tasks, {username}. Let's tackle them one step at a time! What's the most important thing you need to focus on right now?"
         )
-    elif any(word in message.lower() for word in ['tired', 'exhausted', 'stressed']):
+    elif intent == 'tired':
         return personality.get_style('supportive', 
             f"It sounds like you're going through a tough time, {username}. Remember to take care of yourself. What's one small thing that might help you feel better right now?"
         )
-    elif any(word in message.lower() for word in ['happy', 'great', 'awesome', 'excited']):
+    elif intent == 'happy':
         return personality.get_style('playful', 
             f"That's wonderful to hear, {username}! I love your positive energy. What's making you feel so good today?"
         )
-    elif '?' in message:
+    elif intent == 'question':
         return personality.get_style('supportive', 
             f"That's a great question, {username}. I wish I could give you a more detailed answer right now, but I'm having some technical difficulties. What are your thoughts on it?"
         )
@@ -286,13 +428,18 @@ def _generate_fallback_response(user_id: str, message: str, context: Dict) -> st
             f"I hear you, {username}. While I'm having some technical issues with my AI brain right now, I'm still here to listen. Tell me more about what's on your mind."
         )
 
-def check_proactive_engagement(user_id: str, context: Dict) -> Optional[str]:
+def check_proactive_engagement(user_id: str, context: Dict,
+                               overdue: Optional[Tuple[int, List[Dict]]] = None) -> Optional[str]:
     """
     Check if we should initiate a proactive conversation based on context.
     
+    Claims the morning or evening check-in when one is due, so only call
+    this when the returned message will be sent.
+    
     Args:
         user_id: The user's unique identifier
         context: The current conversation context
+        overdue: Result of get_overdue_tasks if already fetched
         
     Returns:
         Optional[str]: A proactive message if conditions are met, else None
@@ -302,29 +449,12 @@ def check_proactive_engagement(user_id: str, context: Dict) -> Optional[str]:
         
         # Morning check-in (between 7-10 AM)
         if 7 <= current_hour < 10:
-            # Check if we've already checked in today
-            last_checkin = memory_system.query_memory(
-                user_id=user_id,
-                query="morning check-in",
-                k=1,
-                tags=['system', 'checkin']
-            )
+            # Claim today's check-in; None means we've already checked in today
+            personal_info = UserProfile.claim_checkin(user_id, 'morning')
             
-            if not last_checkin or datetime.utcnow().date() > datetime.fromisoformat(last_checkin[0]['metadata'].get('timestamp', '2000-01-01')).date():
-                # Save that we've checked in today
-                memory_system.save_memory(
-                    user_id=user_id,
-                    text="Morning check-in completed",
-                    tags=['system', 'checkin'],
-                    metadata={
-                        'type': 'system_checkin',
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                )
-                
+            if personal_info is not None:
                 # Get a personalized morning message
-                profile = UserProfile.get_by_user_id(user_id)
-                name = profile.get('personal_info', {}).get('name', 'friend')
+                name = personal_info.get('name', 'friend')
                 
                 messages = [
                     f"Good morning, {name}! Ready to make today amazing?",
@@ -336,24 +466,7 @@ def check_proactive_engagement(user_id: str, context: Dict) -> Optional[str]:
         # Evening reflection (between 8-11 PM)
         elif 20 <= current_hour < 23:
             # Similar check for evening reflection
-            last_reflection = memory_system.query_memory(
-                user_id=user_id,
-                query="evening reflection",
-                k=1,
-                tags=['system', 'reflection']
-            )
-            
-            if not last_reflection or datetime.utcnow().date() > datetime.fromisoformat(last_reflection[0]['metadata'].get('timestamp', '2000-01-01')).date():
-                memory_system.save_memory(
-                    user_id=user_id,
-                    text="Evening reflection completed",
-                    tags=['system', 'reflection'],
-                    metadata={
-                        'type': 'system_reflection',
-                        'timestamp': datetime.utcnow().isoformat()
-                    }
-                )
-                
+            if UserProfile.claim_checkin(user_id, 'evening') is not None:
                 questions = [
                     "How was your day? What went well?",
                     "What's one thing you're grateful for today?",
@@ -362,11 +475,13 @@ def check_proactive_engagement(user_id: str, context: Dict) -> Optional[str]:
                 return random.choice(questions)
         
         # Check for overdue tasks
-        overdue_tasks = get_overdue_tasks(user_id)
+        if overdue is None:
+            overdue = get_overdue_tasks(user_id)
+        overdue_count, overdue_tasks = overdue
         if overdue_tasks:
-            task_list = '\n'.join([f"- {t['description']}" for t in overdue_tasks[:3]])
+            task_list = '\n'.join([f"- {t['description']}" for t in overdue_tasks])
             return personality.get_style('firm', 
-                f" You have {len(overdue_tasks)} overdue task{'s' if len(overdue_tasks) > 1 else ''}:\n{task_list}\n\nI know you can do this! Which one should we tackle first?"
+                f" You have {overdue_count} overdue task{'s' if overdue_count > 1 else ''}:\n{task_list}\n\nI know you can do this! Which one should we tackle first?"
             )
             
     except Exception as e:
@@ -374,19 +489,29 @@ def check_proactive_engagement(user_id: str, context: Dict) -> Optional[str]:
     
     return None
 
-def get_overdue_tasks(user_id: str) -> List[Dict]:
-    """Get a list of overdue tasks for the user."""
+def get_overdue_tasks(user_id: str, limit: int = OVERDUE_TASKS_SHOWN) -> Tuple[int, List[Dict]]:
+    """
+    Get the user's overdue tasks.
+    
+    Returns:
+        Tuple of (number of overdue tasks, the `limit` oldest of them)
+    """
     try:
         # Get today's date at midnight
         today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
         
-        # Query for incomplete tasks with due dates before today
-        tasks = DailyPlan.get_incomplete_tasks_before(user_id, today)
-        return tasks
+        # Count and fetch from the open-task index, reading only `limit` rows
+        if DailyPlan.open_tasks_backfilled():
+            return (DailyPlan.count_open_tasks_before(user_id, today),
+                    DailyPlan.get_open_tasks_before(user_id, today, limit=limit))
+        
+        # Until migrate_open_tasks.py has run, scan the plan history instead
+        tasks = DailyPlan.get_incomplete_tasks_before(user_id, today, limit=None)
+        return len(tasks), tasks[:limit]
         
     except Exception as e:
         current_app.logger.error(f"Error getting overdue tasks: {str(e)}")
-        return []
+        return 0, []
 
 def save_chat_message(user_id: str, role: str, content: str) -> str:
     """
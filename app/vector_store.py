@@ -0,0 +1,558 @@
+"""
+Vector Store Module
+
+Backends that hold memory vectors for the MemorySystem. Every backend speaks
+the same Chroma-shaped interface (add/query/get/update/delete with `where`
+metadata filters), so the MemorySystem doesn't care which one it is using.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional
+import numpy as np
+
+# Largest batch accepted when the backend doesn't report its own limit
+DEFAULT_MAX_BATCH_SIZE = 5461
+
+
+class VectorStore:
+    """Interface for memory vector storage backends."""
+
+    max_batch_size = DEFAULT_MAX_BATCH_SIZE
+
+    def add(self, ids: List[str], embeddings: List[List[float]], documents: List[str],
+            metadatas: List[Dict[str, Any]]) -> None:
+        """Store vectors with their documents and metadata."""
+        raise NotImplementedError
+
+    def query(self, query_embeddings: List[List[float]], n_results: int = 10,
+              where: Optional[Dict[str, Any]] = None) -> Dict[str, List[List[Any]]]:
+        """
+        Find the nearest stored vectors for each query embedding.
+
+        Returns:
+            Dict with 'ids', 'documents', 'metadatas' and 'distances', each a
+            list with one row per query embedding
+        """
+        raise NotImplementedError
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None,
+            limit: Optional[int] = None, offset: Optional[int] = None,
+            include_embeddings: bool = False) -> Dict[str, List[Any]]:
+        """
+        Fetch stored items by id and/or metadata filter, without similarity search.
+
+        Returns:
+            Dict with flat 'ids', 'documents' and 'metadatas' lists, plus
+            'embeddings' when include_embeddings is set
+        """
+        raise NotImplementedError
+
+    def update(self, ids: List[str], metadatas: List[Dict[str, Any]]) -> None:
+        """Replace the metadata of existing items."""
+        raise NotImplementedError
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict[str, Any]] = None) -> None:
+        """Remove items by id and/or metadata filter."""
+        raise NotImplementedError
+
+    def count(self) -> int:
+        """Number of stored items."""
+        raise NotImplementedError
+
+
+class ChromaVectorStore(VectorStore):
+    """VectorStore backed by a ChromaDB collection."""
+
+    def __init__(self, client, name: str = "memories"):
+        self.client = client
+        try:
+            self.collection = client.get_collection(name)
+        except ValueError:
+            self.collection = client.create_collection(name)
+        self.max_batch_size = getattr(client, 'max_batch_size', DEFAULT_MAX_BATCH_SIZE)
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.collection.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        return self.collection.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include_embeddings=False):
+        include = ['documents', 'metadatas'] + (['embeddings'] if include_embeddings else [])
+        return self.collection.get(ids=ids, where=where, limit=limit, offset=offset, include=include)
+
+    def update(self, ids, metadatas):
+        self.collection.update(ids=ids, metadatas=metadatas)
+
+    def delete(self, ids=None, where=None):
+        self.collection.delete(ids=ids, where=where)
+
+    def count(self):
+        return self.collection.count()
+
+
+def matches_where(metadata: Dict[str, Any], where: Optional[Dict[str, Any]]) -> bool:
+    """Evaluate a Chroma-style where clause against one metadata dict."""
+    if not where:
+        return True
+
+    for key, condition in where.items():
+        if key == '$and':
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == '$or':
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif isinstance(condition, dict):
+            value = metadata.get(key)
+            for op, operand in condition.items():
+                if not _compare(value, op, operand):
+                    return False
+        elif metadata.get(key) != condition:
+            return False
+    return True
+
+
+def _compare(value: Any, op: str, operand: Any) -> bool:
+    """Apply one Chroma comparison operator."""
+    if op == '$eq':
+        return value == operand
+    if op == '$ne':
+        return value != operand
+    if op == '$in':
+        return value in operand
+    if op == '$nin':
+        return value not in operand
+    if value is None:
+        return False
+    if op == '$gt':
+        return value > operand
+    if op == '$gte':
+        return value >= operand
+    if op == '$lt':
+        return value < operand
+    if op == '$lte':
+        return value <= operand
+    raise ValueError(f"Unsupported where operator: {op}")
+
+
+def split_user_filter(where: Optional[Dict[str, Any]]):
+    """
+    Pull a top-level user_id equality out of a where clause.
+
+    Returns:
+        Tuple of (user_id or None, remaining where clause or None)
+    """
+    if not where:
+        return None, None
+    if isinstance(where.get('user_id'), str):
+        rest = {k: v for k, v in where.items() if k != 'user_id'}
+        return where['user_id'], rest or None
+    if '$and' in where and len(where) == 1:
+        clauses = where['$and']
+        for i, clause in enumerate(clauses):
+            if len(clause) == 1 and isinstance(clause.get('user_id'), str):
+                rest = clauses[:i] + clauses[i + 1:]
+                if not rest:
+                    return clause['user_id'], None
+                return clause['user_id'], rest[0] if len(rest) == 1 else {'$and': rest}
+    return None, where
+
+
+def empty_query_results(n_queries: int) -> Dict[str, List[List[Any]]]:
+    """Chroma-shaped query results with one empty row per query."""
+    return {key: [[] for _ in range(n_queries)] for key in ('ids', 'documents', 'metadatas', 'distances')}
+
+
+class _UserPartition:
+    """One user's vectors in a contiguous float32 matrix plus parallel lists."""
+
+    def __init__(self, dim: Optional[int] = None):
+        # Allocated on first add when the dimensionality isn't known yet
+        self.matrix = np.empty((16, dim), dtype=np.float32) if dim else None
+        self.sq_norms = np.empty(16, dtype=np.float32)
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.rows = {}
+        self._text_bytes = 0
+        # Row indexes matching each where clause seen so far; reset on writes
+        self._filter_cache = {}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nbytes(self) -> int:
+        """Approximate memory held by this partition."""
+        matrix_bytes = self.matrix.nbytes if self.matrix is not None else 0
+        return matrix_bytes + self.sq_norms.nbytes + self._text_bytes + 256 * len(self.ids)
+
+    def add(self, memory_id: str, vector: np.ndarray, document: str, metadata: Dict[str, Any]) -> None:
+        if self.matrix is None:
+            self.matrix = np.empty((len(self.sq_norms), len(vector)), dtype=np.float32)
+        if memory_id in self.rows:
+            row = self.rows[memory_id]
+            self._text_bytes -= len(self.documents[row])
+        else:
+            row = len(self.ids)
+            if row == len(self.matrix):
+                self.matrix = np.concatenate([self.matrix, np.empty_like(self.matrix)])
+                self.sq_norms = np.concatenate([self.sq_norms, np.empty_like(self.sq_norms)])
+            self.ids.append(memory_id)
+            self.documents.append(document)
+            self.metadatas.append(metadata)
+            self.rows[memory_id] = row
+        self.matrix[row] = vector
+        self.sq_norms[row] = float(vector @ vector)
+        self._text_bytes += len(document)
+        self.documents[row] = document
+        self.metadatas[row] = metadata
+        self._filter_cache.clear()
+
+    def set_metadata(self, row: int, metadata: Dict[str, Any]) -> None:
+        self.metadatas[row] = metadata
+        self._filter_cache.clear()
+
+    def filter_rows(self, where: Dict[str, Any]) -> np.ndarray:
+        """Row indexes whose metadata matches the where clause."""
+        key = json.dumps(where, sort_keys=True)
+        rows = self._filter_cache.get(key)
+        if rows is None:
+            rows = np.fromiter(
+                (i for i, metadata in enumerate(self.metadatas) if matches_where(metadata, where)),
+                dtype=np.int64
+            )
+            self._filter_cache[key] = rows
+        return rows
+
+    def remove(self, memory_id: str) -> None:
+        """Swap-remove a row so the matrix stays contiguous."""
+        row = self.rows.pop(memory_id)
+        self._text_bytes -= len(self.documents[row])
+        last = len(self.ids) - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.sq_norms[row] = self.sq_norms[last]
+            self.ids[row] = self.ids[last]
+            self.documents[row] = self.documents[last]
+            self.metadatas[row] = self.metadatas[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.documents.pop()
+        self.metadatas.pop()
+        self._filter_cache.clear()
+
+    def search(self, queries: np.ndarray, n_results: int, where: Optional[Dict[str, Any]]):
+        """Exact top-k by squared L2 distance (Chroma's default space)."""
+        size = len(self.ids)
+        if size == 0:
+            return [([], []) for _ in range(len(queries))]
+        candidates = None
+        if where:
+            candidates = self.filter_rows(where)
+            if len(candidates) == 0:
+                return [([], []) for _ in range(len(queries))]
+            matrix = self.matrix[candidates]
+            sq_norms = self.sq_norms[candidates]
+        else:
+            matrix = self.matrix[:size]
+            sq_norms = self.sq_norms[:size]
+
+        distances = sq_norms[None, :] - 2.0 * (queries @ matrix.T) + np.einsum('ij,ij->i', queries, queries)[:, None]
+        k = min(n_results, distances.shape[1])
+        results = []
+        for row in distances:
+            top = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            top = top[np.argsort(row[top])]
+            rows = candidates[top] if candidates is not None else top
+            results.append(([int(i) for i in rows], [max(float(row[i]), 0.0) for i in top]))
+        return results
+
+    def collect(self, queries: np.ndarray, n_results: int, where: Optional[Dict[str, Any]],
+                results: Dict[str, List[List[Any]]]) -> None:
+        """Append this partition's top-k matches to Chroma-shaped query results."""
+        for q, (rows, distances) in enumerate(self.search(queries, n_results, where)):
+            results['ids'][q].extend(self.ids[i] for i in rows)
+            results['documents'][q].extend(self.documents[i] for i in rows)
+            results['metadatas'][q].extend(self.metadatas[i] for i in rows)
+            results['distances'][q].extend(distances)
+
+
+class NumpyVectorStore(VectorStore):
+    """
+    In-process VectorStore doing exact brute-force search with NumPy.
+
+    Each user's vectors live in their own contiguous float32 matrix, so a query
+    scoped to one user touches only that user's rows. Data is held in memory
+    only; use it for tests, benchmarks, or in front of a durable store.
+    """
+
+    def __init__(self, dim: Optional[int] = None):
+        self.dim = dim
+        self._partitions = {}
+        self._owner = {}
+        self._lock = threading.RLock()
+
+    def _partition(self, user_id: Optional[str], create: bool = False) -> Optional[_UserPartition]:
+        partition = self._partitions.get(user_id)
+        if partition is None and create:
+            partition = self._partitions[user_id] = _UserPartition(self.dim)
+        return partition
+
+    def add(self, ids, embeddings, documents, metadatas):
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            for memory_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                user_id = (metadata or {}).get('user_id')
+                previous = self._owner.get(memory_id)
+                if previous is not None and previous != user_id:
+                    self._partitions[previous].remove(memory_id)
+                self._partition(user_id, create=True).add(memory_id, vector, document, dict(metadata or {}))
+                self._owner[memory_id] = user_id
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        queries = np.asarray(query_embeddings, dtype=np.float32)
+        user_id, rest = split_user_filter(where)
+        results = empty_query_results(len(queries))
+
+        with self._lock:
+            if user_id is not None:
+                partitions = [self._partition(user_id)] if user_id in self._partitions else []
+            else:
+                partitions = list(self._partitions.values())
+                rest = where
+
+            for partition in partitions:
+                partition.collect(queries, n_results, rest, results)
+
+        if len(partitions) > 1:
+            for q in range(len(queries)):
+                order = sorted(range(len(results['distances'][q])), key=results['distances'][q].__getitem__)[:n_results]
+                for key in results:
+                    results[key][q] = [results[key][q][i] for i in order]
+        return results
+
+    def _iter_matches(self, ids=None, where=None):
+        """Yield (partition, row) pairs matching the ids and where clause."""
+        if ids is not None:
+            for memory_id in ids:
+                if memory_id not in self._owner:
+                    continue
+                partition = self._partitions[self._owner[memory_id]]
+                row = partition.rows[memory_id]
+                if matches_where(partition.metadatas[row], where):
+                    yield partition, row
+            return
+
+        user_id, rest = split_user_filter(where)
+        if user_id is not None:
+            partitions = [self._partitions[user_id]] if user_id in self._partitions else []
+        else:
+            partitions = list(self._partitions.values())
+            rest = where
+        for partition in partitions:
+            for row in range(len(partition)):
+                if matches_where(partition.metadatas[row], rest):
+                    yield partition, row
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include_embeddings=False):
+        result = {'ids': [], 'documents': [], 'metadatas': []}
+        if include_embeddings:
+            result['embeddings'] = []
+        with self._lock:
+            matches = list(self._iter_matches(ids, where))
+            start = offset or 0
+            end = start + limit if limit is not None else None
+            for partition, row in matches[start:end]:
+                result['ids'].append(partition.ids[row])
+                result['documents'].append(partition.documents[row])
+                result['metadatas'].append(partition.metadatas[row])
+                if include_embeddings:
+                    result['embeddings'].append(partition.matrix[row].tolist())
+        return result
+
+    def update(self, ids, metadatas):
+        with self._lock:
+            for memory_id, metadata in zip(ids, metadatas):
+                if memory_id not in self._owner:
+                    continue
+                partition = self._partitions[self._owner[memory_id]]
+                row = partition.rows[memory_id]
+                new_metadata = dict(partition.metadatas[row])
+                new_metadata.update(metadata)
+                partition.set_metadata(row, new_metadata)
+
+    def delete(self, ids=None, where=None):
+        with self._lock:
+            doomed = [partition.ids[row] for partition, row in self._iter_matches(ids, where)]
+            for memory_id in doomed:
+                user_id = self._owner.pop(memory_id)
+                self._partitions[user_id].remove(memory_id)
+
+    def count(self):
+        with self._lock:
+            return len(self._owner)
+
+
+class CachedVectorStore(VectorStore):
+    """
+    Hot working-set cache of per-user vectors in front of a durable store.
+
+    Once a user queries, their embeddings and metadata are loaded by a small
+    pool of background threads into an in-process matrix, and later
+    user-scoped queries are answered locally. Writes go to the backing store
+    first and are mirrored into hot partitions. Users are evicted
+    least-recently-used whenever loads or writes push the cache past its
+    memory budget, and partitions expire after `ttl` seconds so writes made by
+    other worker processes are picked up.
+    """
+
+    def __init__(self, backing: VectorStore, max_bytes: int = 256 * 1024 * 1024, ttl: float = 300.0,
+                 loader_workers: int = 2):
+        self.backing = backing
+        self.max_batch_size = backing.max_batch_size
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._hot = OrderedDict()
+        self._loaded_at = {}
+        self._loading = {}
+        # Running total of partition.nbytes() over self._hot
+        self._bytes = 0
+        self._lock = threading.RLock()
+        # Fixed pool so a burst of cold users can't start a thread each
+        self._loader = ThreadPoolExecutor(max_workers=loader_workers, thread_name_prefix='vector-cache-load')
+        self.stats = {
+            'hits': 0,
+            'misses': 0,
+            'loads': 0,
+            'evictions': 0
+        }
+
+    def _hot_partition(self, user_id: str) -> Optional[_UserPartition]:
+        """Return the user's partition if it is loaded and fresh."""
+        partition = self._hot.get(user_id)
+        if partition is None:
+            return None
+        if time.monotonic() - self._loaded_at[user_id] > self.ttl:
+            self._drop(user_id)
+            return None
+        self._hot.move_to_end(user_id)
+        return partition
+
+    def _drop(self, user_id: str) -> None:
+        partition = self._hot.pop(user_id, None)
+        if partition is not None:
+            self._bytes -= partition.nbytes()
+        self._loaded_at.pop(user_id, None)
+
+    def _schedule_load(self, user_id: str) -> None:
+        """Start loading a user's working set unless a load is already running."""
+        if user_id in self._loading:
+            return
+        self._loading[user_id] = False
+        self._loader.submit(self._load, user_id)
+
+    def _load(self, user_id: str) -> None:
+        """Copy a user's vectors from the backing store into a hot partition."""
+        try:
+            data = self.backing.get(where={'user_id': user_id}, include_embeddings=True)
+            embeddings = data.get('embeddings')
+            partition = _UserPartition()
+            if embeddings is not None and len(embeddings) > 0:
+                vectors = np.asarray(embeddings, dtype=np.float32)
+                for memory_id, vector, document, metadata in zip(
+                        data['ids'], vectors, data['documents'], data['metadatas']):
+                    partition.add(memory_id, vector, document, metadata)
+        except Exception as e:
+            print(f"Warning: Could not load memory working set for {user_id}: {e}")
+            partition = None
+
+        with self._lock:
+            dirty = self._loading.pop(user_id, True)
+            # A write landed while loading; the snapshot may be missing it
+            if partition is None or dirty:
+                return
+            self._drop(user_id)
+            self._hot[user_id] = partition
+            self._bytes += partition.nbytes()
+            self._loaded_at[user_id] = time.monotonic()
+            self.stats['loads'] += 1
+            self._enforce_budget()
+
+    def _enforce_budget(self) -> None:
+        """Evict idle users until the cache fits its memory budget."""
+        while self._bytes > self.max_bytes and len(self._hot) > 1:
+            self._drop(next(iter(self._hot)))
+            self.stats['evictions'] += 1
+
+    def add(self, ids, embeddings, documents, metadatas):
+        self.backing.add(ids=ids, embeddings=embeddings, documents=documents, metadatas=metadatas)
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        with self._lock:
+            for memory_id, vector, document, metadata in zip(ids, vectors, documents, metadatas):
+                user_id = (metadata or {}).get('user_id')
+                if user_id in self._loading:
+                    self._loading[user_id] = True
+                partition = self._hot.get(user_id)
+                if partition is not None:
+                    before = partition.nbytes()
+                    partition.add(memory_id, vector, document, dict(metadata))
+                    self._bytes += partition.nbytes() - before
+            self._enforce_budget()
+
+    def query(self, query_embeddings, n_results=10, where=None):
+        user_id, rest = split_user_filter(where)
+        if user_id is not None:
+            with self._lock:
+                partition = self._hot_partition(user_id)
+                if partition is not None:
+                    self.stats['hits'] += 1
+                    queries = np.asarray(query_embeddings, dtype=np.float32)
+                    results = empty_query_results(len(queries))
+                    partition.collect(queries, n_results, rest, results)
+                    return results
+                self.stats['misses'] += 1
+                self._schedule_load(user_id)
+        return self.backing.query(query_embeddings=query_embeddings, n_results=n_results, where=where)
+
+    def get(self, ids=None, where=None, limit=None, offset=None, include_embeddings=False):
+        return self.backing.get(ids=ids, where=where, limit=limit, offset=offset,
+                                include_embeddings=include_embeddings)
+
+    def _invalidate(self, ids=None) -> None:
+        """Drop hot partitions affected by an update or delete."""
+        with self._lock:
+            for user_id in list(self._loading):
+                self._loading[user_id] = True
+            if ids is None:
+                self._hot.clear()
+                self._loaded_at.clear()
+                self._bytes = 0
+                return
+            for user_id, partition in list(self._hot.items()):
+                if any(memory_id in partition.rows for memory_id in ids):
+                    self._drop(user_id)
+
+    def update(self, ids, metadatas):
+        self.backing.update(ids=ids, metadatas=metadatas)
+        self._invalidate(ids)
+
+    def delete(self, ids=None, where=None):
+        self.backing.delete(ids=ids, where=where)
+        self._invalidate(ids if where is None else None)
+
+    def count(self):
+        return self.backing.count()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and current cache size."""
+        with self._lock:
+            stats = dict(self.stats)
+            stats['hot_users'] = len(self._hot)
+            stats['bytes'] = self._bytes
+        return stats
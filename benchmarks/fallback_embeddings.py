@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for the local fallback embedding generator.
+
+Compares the original per-text md5 loop with the batched NumPy n-gram
+implementation for batches of 1, 100 and 10,000 texts.
+
+Usage:
+    python benchmarks/fallback_embeddings.py
+"""
+import os
+import sys
+import time
+import hashlib
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.local_embeddings import hashed_ngram_embeddings
+
+WORDS = (
+    "today tasks mood feeling tired work meeting gym finish report call mom "
+    "groceries study exam project deadline happy stressed coffee walk sleep "
+    "read book plan week goals evening morning reflection friend dinner"
+).split()
+
+
+def legacy_fallback_embeddings(texts):
+    """The original md5-based fallback, kept here as the baseline."""
+    embeddings = []
+    for text in texts:
+        hash_bytes = hashlib.md5(text.encode()).digest()
+        vector = []
+        for i in range(768):
+            vector.append(float(hash_bytes[i % len(hash_bytes)]) / 255.0 - 0.5)
+        embeddings.append(vector)
+    return embeddings
+
+
+def make_texts(n, rng):
+    """Generate n chat-sized messages."""
+    return [" ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 30))) for _ in range(n)]
+
+
+def timed(func, texts, repeat):
+    """Best wall-clock time of `repeat` runs, in seconds."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(texts)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'texts':>7} | {'legacy (texts/s)':>17} | {'numpy (texts/s)':>16} | {'speedup':>7}")
+    print("-" * 58)
+    for n in (1, 100, 10000):
+        texts = make_texts(n, rng)
+        repeat = 50 if n == 1 else (10 if n == 100 else 3)
+        legacy = timed(legacy_fallback_embeddings, texts, repeat)
+        vectorized = timed(hashed_ngram_embeddings, texts, repeat)
+        print(f"{n:>7} | {n / legacy:>17,.0f} | {n / vectorized:>16,.0f} | {legacy / vectorized:>6.1f}x")
+
+    # Sanity check: related texts should now be closer than unrelated ones
+    a, b, c = hashed_ngram_embeddings([
+        "I feel tired after work today",
+        "feeling so tired after work",
+        "let's plan the birthday dinner",
+    ])
+    print(f"\ncosine(similar) = {float(a @ b):.3f}, cosine(unrelated) = {float(a @ c):.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Latency of incomplete-task retrieval for users with long plan histories.
+
+Seeds a throwaway MongoDB database with one user who has a year of daily
+plans and one who has three years, then times:
+
+- the original approach (stream every past plan into Python and loop),
+- DailyPlan.get_incomplete_tasks_before (aggregation pipeline), and
+- DailyPlan.get_open_tasks_before (open_tasks index).
+
+Every approach returns all of the user's incomplete tasks (no limit), and
+each result count is printed so the timings compare equal output.
+
+Requires a reachable MongoDB server; the database is dropped afterwards.
+
+Usage:
+    MONGODB_URI=mongodb://localhost:27017 python benchmarks/incomplete_tasks.py
+"""
+import os
+import sys
+import time
+import random
+import statistics
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+
+from app.extensions import mongo
+from app.models import DailyPlan, daily_plans, create_indexes
+
+DB_NAME = 'ai_friend_bench_tasks'
+TASKS_PER_PLAN = 5
+OPEN_RATE = 0.1
+HISTORIES = {'1 year': 365, '3 years': 3 * 365}
+
+
+def legacy_incomplete_tasks(user_id, before_date):
+    """The pre-pipeline implementation: fetch whole plans and filter in Python."""
+    tasks = []
+    for plan in daily_plans().find({'user_id': user_id, 'date': {'$lt': before_date.isoformat()}}):
+        plan_date = datetime.fromisoformat(plan['date'])
+        for task in plan.get('tasks', []):
+            if isinstance(task, str):
+                task = {'description': task, 'completed': False}
+            elif not isinstance(task, dict):
+                continue
+            if task.get('completed') is True:
+                continue
+            tasks.append({
+                'description': task.get('description') or 'Unnamed task',
+                'due_date': plan_date,
+                'plan_date': plan_date,
+                'task_id': str(task.get('id') or ''),
+                'raw_task': task
+            })
+    return tasks
+
+
+def seed(user_id, days, rng):
+    """Create one plan per day, ending yesterday, with a few open tasks each."""
+    today = datetime.utcnow().date()
+    for offset in range(days, 0, -1):
+        tasks = [
+            {
+                'id': f'{user_id}-{offset}-{i}',
+                'description': f'task {i} from {offset} days ago',
+                'completed': rng.random() > OPEN_RATE,
+                'created_at': datetime.utcnow().isoformat()
+            }
+            for i in range(TASKS_PER_PLAN)
+        ]
+        DailyPlan.create(user_id, (today - timedelta(days=offset)).isoformat(), tasks, 'ok')
+
+
+def time_call(fn, runs=30):
+    """Median latency in milliseconds and the size of the last result."""
+    samples = []
+    result = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), len(result)
+
+
+def main():
+    uri = os.getenv('MONGODB_URI', 'mongodb://localhost:27017').rsplit('/', 1)[0]
+    app = Flask(__name__)
+    app.config['MONGO_URI'] = f'{uri}/{DB_NAME}'
+    mongo.init_app(app)
+
+    with app.app_context():
+        mongo.cx.drop_database(DB_NAME)
+        create_indexes()
+        rng = random.Random(7)
+        today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+
+        print(f"{'history':<8} | {'plans':>5} | {'python loop (ms)':>16} | {'pipeline (ms)':>13} | "
+              f"{'open_tasks (ms)':>15} | {'open (loop/pipeline/index)':>26}")
+        print("-" * 101)
+        try:
+            for label, days in HISTORIES.items():
+                user_id = f'bench-{days}'
+                seed(user_id, days, rng)
+                legacy, legacy_count = time_call(lambda: legacy_incomplete_tasks(user_id, today))
+                pipeline, pipeline_count = time_call(
+                    lambda: DailyPlan.get_incomplete_tasks_before(user_id, today, limit=None))
+                indexed, indexed_count = time_call(lambda: DailyPlan.get_open_tasks_before(user_id, today))
+                counts = f"{legacy_count}/{pipeline_count}/{indexed_count}"
+                print(f"{label:<8} | {days:>5} | {legacy:>16.2f} | {pipeline:>13.2f} | {indexed:>15.2f} | {counts:>26}")
+        finally:
+            mongo.cx.drop_database(DB_NAME)
+
+
+if __name__ == '__main__':
+    main()
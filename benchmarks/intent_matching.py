@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Throughput of fallback intent classification: keyword chains vs IntentMatcher.
+
+Classifies a corpus of realistic chat messages with the original chain of
+`any(word in message.lower() for word in [...])` checks and with the
+compiled FALLBACK_INTENTS matcher, checks that both agree on every message,
+and reports the time per message.
+
+Usage:
+    python benchmarks/intent_matching.py
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.intents import FALLBACK_INTENTS
+
+MESSAGES = [
+    "hi",
+    "Hey, how are you doing today?",
+    "My name is Priya and I live in Lisbon",
+    "I'm from Toronto originally but moved last year",
+    "I am so tired after that meeting, honestly",
+    "Ugh, work has been crazy this week and I'm behind on everything",
+    "Can you remind me what's on my todo list?",
+    "I finished the report!! Feeling awesome",
+    "I'm exhausted and stressed about the exam tomorrow",
+    "What should I cook for dinner tonight?",
+    "Not much, just hanging around the house",
+    "The weather here has been great, lots of sun",
+    "I need to call my mom later, don't let me forget",
+    "Do you think I should take the new job offer?",
+    "I've been really busy with the move, sorry for disappearing",
+    "lol that's funny",
+    "Went for a run this morning, first time in weeks",
+    "I'm excited for the concert on Saturday",
+    "Why do I always procrastinate on the important stuff",
+    "Just got back from the doctor, everything is fine",
+    "I think I want to start learning the guitar again",
+    "The kids are finally asleep. Long day.",
+    "Any tips for staying focused when studying?",
+    "I had a fight with my roommate about the dishes again and I don't really know how to bring it up without it turning into another argument",
+    "Happy Friday!",
+    "ok",
+]
+
+
+def chain_intent(message):
+    """The original classification chain from _generate_fallback_response."""
+    if any(phrase in message.lower() for phrase in ['my name is', "i'm ", "i am ", "i'm from", "i live in"]):
+        return 'personal_info'
+    if any(word in message.lower() for word in ['task', 'todo', 'work', 'busy']):
+        return 'tasks'
+    elif any(word in message.lower() for word in ['tired', 'exhausted', 'stressed']):
+        return 'tired'
+    elif any(word in message.lower() for word in ['happy', 'great', 'awesome', 'excited']):
+        return 'happy'
+    elif '?' in message:
+        return 'question'
+    return None
+
+
+def time_classifier(classify, corpus, rounds=20):
+    """Best-of-rounds time per message in microseconds."""
+    best = float('inf')
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for message in corpus:
+            classify(message)
+        best = min(best, time.perf_counter() - start)
+    return best / len(corpus) * 1e6
+
+
+def main():
+    rng = random.Random(7)
+    corpus = [rng.choice(MESSAGES) for _ in range(20000)]
+
+    mismatches = [m for m in MESSAGES if chain_intent(m) != FALLBACK_INTENTS.match(m)]
+    if mismatches:
+        print("Classifiers disagree on:")
+        for message in mismatches:
+            print(f"  {message!r}: chain={chain_intent(message)} matcher={FALLBACK_INTENTS.match(message)}")
+        sys.exit(1)
+
+    chain = time_classifier(chain_intent, corpus)
+    matcher = time_classifier(FALLBACK_INTENTS.match, corpus)
+    print(f"{'classifier':<14} | {'us/message':>10}")
+    print("-" * 27)
+    print(f"{'any() chains':<14} | {chain:>10.2f}")
+    print(f"{'IntentMatcher':<14} | {matcher:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
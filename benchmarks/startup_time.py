@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Measure import and app-creation time for the current tree and a git ref.
+
+Each measurement runs in a fresh interpreter so module caches don't carry
+over. By default the current working tree is compared with the repository's
+root commit, which is extracted into a temporary directory with `git archive`.
+
+Usage:
+    python benchmarks/startup_time.py [--ref <git-ref>] [--runs N]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPETS = {
+    'import app.memory_system': 'import app.memory_system',
+    'import app.routes': 'import app.routes',
+    'create_app()': 'from app.factory import create_app; create_app()',
+}
+
+TIMER = (
+    "import time, sys; start = time.perf_counter(); "
+    "{snippet}; "
+    "sys.stdout.write(repr(time.perf_counter() - start))"
+)
+
+
+def measure(tree, snippet, runs):
+    """Median wall-clock seconds for running `snippet` in `tree`, or None on failure."""
+    env = dict(os.environ)
+    env.setdefault('GOOGLE_API_KEY', 'startup-benchmark')
+    env['PYTHONPATH'] = tree
+    samples = []
+    for _ in range(runs):
+        proc = subprocess.run(
+            [sys.executable, '-c', TIMER.format(snippet=snippet)],
+            cwd=tree, env=env, capture_output=True, text=True
+        )
+        if proc.returncode != 0:
+            last_line = (proc.stderr.strip().splitlines() or ['unknown error'])[-1]
+            return None, last_line
+        samples.append(float(proc.stdout.strip().splitlines()[-1]))
+    return statistics.median(samples), None
+
+
+def export_ref(ref, target):
+    """Extract the tree at `ref` into `target`."""
+    archive = subprocess.run(['git', 'archive', ref], cwd=ROOT, capture_output=True, check=True)
+    subprocess.run(['tar', '-x', '-C', target], input=archive.stdout, check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--ref', help='git ref to compare against (default: root commit)')
+    parser.add_argument('--runs', type=int, default=5, help='runs per measurement (default: 5)')
+    args = parser.parse_args()
+    if not args.ref:
+        args.ref = subprocess.run(
+            ['git', 'rev-list', '--max-parents=0', 'HEAD'],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.split()[0][:7]
+
+    with tempfile.TemporaryDirectory() as before_tree:
+        export_ref(args.ref, before_tree)
+        print(f"{'step':<26} | {'before (' + args.ref + ')':>18} | {'after (worktree)':>18}")
+        print("-" * 68)
+        for label, snippet in SNIPPETS.items():
+            row = []
+            for tree in (before_tree, ROOT):
+                seconds, error = measure(tree, snippet, args.runs)
+                row.append(f"{seconds * 1000:>15.1f} ms" if seconds is not None else f"{'failed':>18}")
+                if error:
+                    print(f"  {label} failed in {tree}: {error}", file=sys.stderr)
+            print(f"{label:<26} | {row[0]:>18} | {row[1]:>18}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Query latency of the in-process NumPy vector store versus ChromaDB.
+
+Loads N random 768-dim memories for one user (plus other users' noise) and
+times a user-scoped top-5 query with and without a tag filter. ChromaDB is
+measured with an ephemeral client when it is installed.
+
+Usage:
+    python benchmarks/vector_store.py
+"""
+import os
+import sys
+import time
+import uuid
+import statistics
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.memory import build_where
+from app.vector_store import NumpyVectorStore, ChromaVectorStore
+
+DIM = 768
+OTHER_USERS = 20
+
+
+def load(store, n, rng):
+    """Fill a store with n memories for 'u0' and n/4 for each other user."""
+    for user in range(OTHER_USERS + 1):
+        count = n if user == 0 else max(1, n // 4)
+        for start in range(0, count, 1000):
+            size = min(1000, count - start)
+            tags = ['chat' if i % 3 else 'mood' for i in range(size)]
+            store.add(
+                ids=[str(uuid.uuid4()) for _ in range(size)],
+                embeddings=rng.standard_normal((size, DIM)).astype(np.float32).tolist(),
+                documents=[f"memory {start + i}" for i in range(size)],
+                metadatas=[{'user_id': f'u{user}', 'tags': tag, f'tag_{tag}': 1} for tag in tags],
+            )
+
+
+def time_query(store, where, rng, runs=50):
+    """Median query latency in milliseconds."""
+    samples = []
+    for _ in range(runs):
+        query = rng.standard_normal((1, DIM)).astype(np.float32).tolist()
+        start = time.perf_counter()
+        store.query(query_embeddings=query, n_results=5, where=where)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def make_stores():
+    stores = {'numpy': NumpyVectorStore}
+    try:
+        import chromadb
+        from chromadb.config import Settings
+        stores['chroma'] = lambda: ChromaVectorStore(
+            chromadb.EphemeralClient(Settings(anonymized_telemetry=False)), f"bench-{uuid.uuid4().hex[:8]}"
+        )
+    except ImportError:
+        print("chromadb not installed; measuring the NumPy store only\n")
+    return stores
+
+
+def main():
+    stores = make_stores()
+    print(f"{'store':<7} | {'memories':>8} | {'user only (ms)':>14} | {'user + tag (ms)':>15}")
+    print("-" * 55)
+    for name, factory in stores.items():
+        for n in (100, 1000, 5000):
+            rng = np.random.default_rng(7)
+            store = factory()
+            load(store, n, rng)
+            user_only = time_query(store, build_where('u0'), rng)
+            with_tag = time_query(store, build_where('u0', ['mood']), rng)
+            print(f"{name:<7} | {n:>8} | {user_only:>14.3f} | {with_tag:>15.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+One-time migration for vector memories saved before tags were indexed.
+
+Adds a "tag_<name>" metadata key for every tag in each memory's comma-joined
+"tags" string so that tag filtering can run inside ChromaDB.
+"""
+
+def main():
+    from app.memory_system import memory_system
+
+    print("Migrating memory tag metadata...")
+    updated = memory_system.migrate_tag_metadata()
+    print(f"✓ Updated {updated} memories")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+One-time backfill of the open_tasks collection.
+
+Indexes the incomplete tasks of every existing daily plan so overdue-task
+checks can read open_tasks instead of scanning plan history. Until this has
+run, overdue-task checks keep scanning plan history.
+"""
+
+def main():
+    from app.factory import create_app
+    from app.models import DailyPlan
+
+    app = create_app()
+    with app.app_context():
+        print("Rebuilding open task index...")
+        count = DailyPlan.rebuild_open_tasks()
+        print(f"✓ Indexed {count} plans")
+
+if __name__ == "__main__":
+    main()
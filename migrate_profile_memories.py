@@ -0,0 +1,21 @@
+#!/usr/bin/env python3
+"""
+One-time migration for profile memories stored inside user_profiles.
+
+Moves each profile's embedded "memories" array into the profile_memories
+collection and removes the array from the profile document. Until this has
+run, memory reads also scan the embedded arrays.
+"""
+
+def main():
+    from app.factory import create_app
+    from app.models import UserProfile
+
+    app = create_app()
+    with app.app_context():
+        print("Migrating embedded profile memories...")
+        moved = UserProfile.migrate_embedded_memories()
+        print(f"✓ Moved {moved} memories")
+
+if __name__ == "__main__":
+    main()
@@ -36,7 +36,7 @@ def clear_mongodb():
         db = client[db_name]
         
         # List collections to clear
-        collections = ['user_profiles', 'daily_plans', 'chat_messages']
+        collections = ['user_profiles', 'daily_plans', 'chat_messages', 'profile_memories', 'open_tasks']
         
         for collection_name in collections:
             if collection_name in db.list_collection_names():